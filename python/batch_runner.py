@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from generate_corpus import iter_cases
+from model_router import FAST_MODEL, REASONING_MODEL, THRESHOLD, ModelRouter
+from ollama_client import get_client
+from prompt_encoding import FORMATS
+from prompts import build_prompt
+from scheduler import BATCH, ScheduledClient
+
+DEFAULT_MODEL = "llama3.1"
+
+
+def read_cases(path):
+    """Yield cases from a JSONL file, one case object per line."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def completed_case_ids(output_path):
+    """
+    Return the Case IDs that already have a successful result in `output_path`.
+
+    The output file doubles as the checkpoint: a rerun skips everything listed here and
+    retries cases whose previous attempt recorded an error.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # a partially written last line from an interrupted run
+                continue
+            if not record.get("error"):
+                done.add(record["Case ID"])
+    return done
+
+
+def run_case(case, model=DEFAULT_MODEL, options=None, client=None, encoding="pretty", router=None):
+    """
+    Build the prompt for one case and run it through the model, or through the model
+    `router` picks for it.
+
+    Returns:
+        dict: A result record ready to be written as one JSONL line.
+    """
+    client = client or get_client()
+    record = {"Case ID": case["Case ID"], "model": model}
+    start = time.perf_counter()
+    try:
+        if router is not None:
+            body = router.generate(case, build_prompt(case, encoding), client, options)
+            record["model"] = body["model"]
+            record["route"] = body["route"]
+        else:
+            body = client.generate(model, build_prompt(case, encoding), options=options)
+        record["response"] = body["response"]
+        record["eval_count"] = body.get("eval_count")
+        record["prompt_eval_count"] = body.get("prompt_eval_count")
+    except Exception as e:
+        record["error"] = str(e)
+    record["latency"] = round(time.perf_counter() - start, 4)
+    return record
+
+
+def run_batch(cases, output_path, model=DEFAULT_MODEL, concurrency=4, options=None, client=None,
+              on_result=None, encoding="pretty", router=None, scheduler=None):
+    """
+    Push `cases` through the model with at most `concurrency` requests in flight.
+
+    Results are appended to `output_path` as they complete, so an interrupted run can be
+    resumed by calling `run_batch` again with the same arguments.
+
+    Parameters:
+        cases (iterable): Case dicts with a "Case ID" key, consumed lazily.
+        output_path (str): JSONL file that receives one record per case.
+        model (str): The name of the model to use.
+        concurrency (int): Maximum number of cases processed at the same time.
+        options (dict): Ollama generation options.
+        on_result (callable): Called with every record after it is written.
+        encoding (str): Prompt encoding from `prompt_encoding.FORMATS`.
+        router (ModelRouter): If given, picks the model of every case instead of `model`.
+        scheduler (Scheduler): Admission control shared with interactive requests, defaults to
+            `get_scheduler()`. Every generation runs at `BATCH` priority; shed cases are recorded
+            as errors and retried by the next run.
+
+    Returns:
+        dict: Counts of `done`, `failed` and `skipped` cases.
+    """
+    client = ScheduledClient(client or get_client(), scheduler, BATCH)
+    skip = completed_case_ids(output_path)
+    stats = {"done": 0, "failed": 0, "skipped": 0}
+    write_lock = threading.Lock()
+
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(concurrency) as pool:
+        def write(record):
+            with write_lock:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+            stats["failed" if record.get("error") else "done"] += 1
+            if on_result:
+                on_result(record)
+
+        pending = set()
+        for case in cases:
+            if case["Case ID"] in skip:
+                stats["skipped"] += 1
+                continue
+            # keep the number of queued futures bounded so huge inputs stay in constant memory
+            if len(pending) >= concurrency * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    write(future.result())
+            pending.add(pool.submit(run_case, case, model, options, client, encoding, router))
+
+        for future in wait(pending).done:
+            write(future.result())
+
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate feedback for a batch of cases")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="JSONL file with one case per line")
+    source.add_argument("--generate", choices=["generic", "japanese"], help="generate cases on the fly")
+    parser.add_argument("--count", type=int, default=100, help="number of cases to generate")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the generated cases, keep it when resuming")
+    parser.add_argument("--output", default="batch_results.jsonl")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--encoding", choices=FORMATS, default="pretty")
+    parser.add_argument("--route", action="store_true", help="pick a fast or reasoning model per case")
+    parser.add_argument("--fast-model", default=FAST_MODEL)
+    parser.add_argument("--reasoning-model", default=REASONING_MODEL)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="complexity score of the reasoning route")
+    args = parser.parse_args()
+
+    if args.input:
+        cases = read_cases(args.input)
+    else:
+        cases = iter_cases(args.count, args.seed, args.generate)
+
+    router = ModelRouter(args.fast_model, args.reasoning_model, args.threshold) if args.route else None
+    stats = run_batch(cases, args.output, model=args.model, concurrency=args.concurrency, encoding=args.encoding,
+                      on_result=lambda r: print(f"case {r['Case ID']}: {r.get('error') or 'ok'} ({r['latency']}s)"),
+                      router=router)
+    print(stats)
+    if router is not None:
+        print(router.stats())
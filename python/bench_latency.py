@@ -0,0 +1,273 @@
+import argparse
+import importlib.util
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+
+from generate_corpus import iter_cases
+from ollama_client import OllamaClient
+from ollama_stub import start_stub_server
+from prompt_encoding import estimate_tokens
+from prompts import build_prompt
+from user_store import UserStore, import_user_data
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TARGETS = ("main", "llm-run-2", "llm-run-2-evaluated")
+RESULTS_PATH = os.path.join(HERE, "bench_results.jsonl")
+# Targets that print the response only once it is complete, so their TTFT cannot be observed
+NO_TTFT_TARGETS = ("llm-run-2-evaluated",)
+
+
+class OutputRecorder:
+    """
+    Stand-in for stdout that remembers, per thread, when the first token was printed and
+    what was printed. For the scripts that print the response as it arrives this measures time
+    to first token the way a user watching the terminal would see it; those that print it only
+    once it is complete are listed in `NO_TTFT_TARGETS` and get no TTFT.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def reset(self):
+        self._local.first = None
+        self._local.parts = []
+
+    @property
+    def first(self):
+        return self._local.first
+
+    @property
+    def text(self):
+        return "".join(self._local.parts)
+
+    def write(self, text):
+        if text:
+            if self._local.first is None:
+                self._local.first = time.perf_counter()
+            self._local.parts.append(text)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def load_script(name):
+    """Import one of the scripts of this folder by file name, hyphens included."""
+    spec = importlib.util.spec_from_file_location(name.replace("-", "_"), os.path.join(HERE, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def case_user_data(case):
+    """`case` in the user_data.json shape read by llm-run-2-evaluated.py."""
+    return {
+        "user_personalization": {"User Personalization": case["User Personalization"]},
+        "squat_performance": {"Squat Performance Analysis": case["Squat Performance Analysis"]},
+        "feedback_history": [],
+    }
+
+
+def make_runner(target, client, model, cases):
+    """
+    Returns:
+        callable: Takes the index of a case in `cases` and sends that case through `target`,
+        printing the response.
+    """
+    if target in ("main", "llm-run-2"):
+        prompts = [build_prompt(case) for case in cases]
+        if target == "main":
+            module = load_script("main")
+            return lambda i: module.generate(prompts[i], [], client=client)
+        module = load_script("llm-run-2")
+        return lambda i: module.run_ollama(prompts[i], model, client=client,
+                                           on_token=lambda token: print(token, end=""))
+    if target == "llm-run-2-evaluated":
+        # uses the `ollama` package, which reads $OLLAMA_HOST when it is imported; every case
+        # is a user of an in-memory store, so each request builds its prompt from its own case
+        os.environ["OLLAMA_HOST"] = client.base_url
+        module = load_script("llm-run-2-evaluated")
+        store = UserStore()
+        for i, case in enumerate(cases):
+            import_user_data(store, case_user_data(case), user_id=f"case-{i}")
+        return lambda i: module.run_ollama(model, user_id=f"case-{i}", store=store)
+    raise ValueError(f"Unknown target: {target}")
+
+
+def percentile(values, q):
+    """Nearest-rank percentile, `q` in 0..100."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def rss_mb():
+    """Current resident set size in MB, from /proc where available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return None
+
+
+def max_rss_mb():
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    scale = 2**20 if sys.platform == "darwin" else 2**10
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def bench_target(run, count, concurrency=1, warmup=2, ttft=True):
+    """
+    Send the first `warmup` of `count` cases through `run` one by one, then time the others
+    with `concurrency` threads.
+
+    Parameters:
+        ttft (bool): False for targets that print nothing before the response is complete;
+            their TTFT percentiles are reported as None instead of equal to the total.
+
+    Returns:
+        dict: Latency percentiles in milliseconds, throughput and memory.
+    """
+    recorder = OutputRecorder()
+    ttfts, totals, errors = [], [], 0
+    output_tokens = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors, output_tokens
+        recorder.reset()
+        start = time.perf_counter()
+        try:
+            run(i)
+        except Exception as e:
+            print(f"request failed: {e}", file=sys.stderr)
+            with lock:
+                errors += 1
+            return
+        end = time.perf_counter()
+        with lock:
+            if ttft:
+                ttfts.append((recorder.first or end) - start)
+            totals.append(end - start)
+            output_tokens += estimate_tokens(recorder.text)
+
+    with redirect_stdout(recorder):
+        for i in range(min(warmup, count)):
+            recorder.reset()
+            run(i)
+        measured = range(warmup, count)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(one, measured))
+        wall = time.perf_counter() - start
+
+    result = {"requests": len(measured), "errors": errors, "wall_s": round(wall, 3)}
+    for name, values in (("ttft", ttfts), ("total", totals)):
+        for q in (50, 95, 99):
+            value = percentile(values, q)
+            result[f"{name}_p{q}_ms"] = None if value is None else round(value * 1000, 2)
+    result["requests_per_s"] = round(len(totals) / wall, 2) if wall else None
+    result["tokens_per_s"] = round(output_tokens / wall, 1) if wall else None
+    result["rss_mb"] = None if rss_mb() is None else round(rss_mb(), 1)
+    result["max_rss_mb"] = round(max_rss_mb(), 1)
+    return result
+
+
+def git_revision():
+    """Short hash of HEAD, with "-dirty" appended if tracked files are modified."""
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                             text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=HERE,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{rev}-dirty" if dirty else rev
+
+
+def save_results(records, path=RESULTS_PATH):
+    with open(path, "a") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def load_results(path=RESULTS_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+COLUMNS = ("ttft_p50_ms", "ttft_p95_ms", "ttft_p99_ms", "total_p50_ms", "total_p95_ms", "total_p99_ms",
+           "requests_per_s", "tokens_per_s", "max_rss_mb")
+
+
+def print_table(records):
+    header = "".join(f"{column.removesuffix('_ms'):>15}" for column in COLUMNS)
+    print(f"{'revision':<16}{'target':<22}{'conc':>5}{header}")
+    for record in records:
+        print(f"{record['revision']:<16}{record['target']:<22}{record['params']['concurrency']:>5}"
+              + "".join(f"{'-' if record.get(column) is None else record[column]:>15}" for column in COLUMNS))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end latency benchmark of the feedback scripts")
+    parser.add_argument("--target", choices=TARGETS, action="append", help="default: all targets")
+    parser.add_argument("--count", type=int, default=50, help="generated cases per target")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--model", default="llama3.1")
+    parser.add_argument("--host", help="benchmark a running server instead of the built-in stub")
+    parser.add_argument("--first-token-delay", type=float, default=0.2, help="stub prefill time in seconds")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="stub tokens per second")
+    parser.add_argument("--output", default=RESULTS_PATH, help="JSONL file the results are appended to")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="print the stored results and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        print_table(load_results(args.output))
+        sys.exit()
+
+    server = None
+    host = args.host
+    if host is None:
+        server = start_stub_server(first_token_delay=args.first_token_delay, token_delay=1 / args.token_rate)
+        host = server.url
+    client = OllamaClient(host, max_connections=args.concurrency, max_concurrency=args.concurrency)
+    cases = list(iter_cases(args.count + args.warmup, args.seed))
+
+    revision = git_revision()
+    params = {key: getattr(args, key) for key in ("count", "seed", "concurrency", "model")}
+    if server is not None:
+        params.update(first_token_delay=args.first_token_delay, token_rate=args.token_rate)
+    else:
+        params["host"] = host
+
+    records = []
+    for target in args.target or TARGETS:
+        try:
+            run = make_runner(target, client, args.model, cases)
+        except ImportError as e:
+            print(f"skipping {target}: {e}", file=sys.stderr)
+            continue
+        result = bench_target(run, len(cases), args.concurrency, args.warmup, ttft=target not in NO_TTFT_TARGETS)
+        records.append({"revision": revision, "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                        "target": target, "params": params, **result})
+
+    print_table(records)
+    if not args.no_save:
+        save_results(records, args.output)
+    if server is not None:
+        server.shutdown()
@@ -0,0 +1,37 @@
+import argparse
+import json
+import time
+
+from generate_corpus import iter_cases
+from prompt_encoding import encode
+from prompts import COACHING, COACHING_TEMPLATE
+
+
+def bench(name, build, cases):
+    start = time.perf_counter()
+    total_chars = 0
+    for case in cases:
+        total_chars += len(build(case))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<34}{elapsed / len(cases) * 1e6:>10.1f} us/prompt{total_chars / len(cases):>10.0f} chars")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmark of prompt building")
+    parser.add_argument("--count", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    cases = list(iter_cases(args.count, args.seed))
+    encoded = [json.dumps(case, indent=4) for case in cases]
+    print(f"{len(cases)} cases, static prefix {COACHING.static_prefix_tokens} tokens, "
+          f"static text {COACHING.static_tokens} tokens")
+
+    bench("str.format + json.dumps(indent=4)",
+          lambda case: COACHING_TEMPLATE.format(input_json=json.dumps(case, indent=4)), cases)
+    bench("compiled + pretty", lambda case: COACHING.render(input_json=encode(case, "pretty")), cases)
+    bench("compiled + minified", lambda case: COACHING.render(input_json=encode(case, "minified")), cases)
+    bench("compiled + tabular", lambda case: COACHING.render(input_json=encode(case, "tabular", True)), cases)
+    # assembly alone, with the data already encoded
+    bench("str.format, pre-encoded", lambda i: COACHING_TEMPLATE.format(input_json=encoded[i]), range(len(cases)))
+    bench("compiled, pre-encoded", lambda i: COACHING.render(input_json=encoded[i]), range(len(cases)))
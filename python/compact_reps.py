@@ -0,0 +1,162 @@
+from array import array
+
+from rule_feedback import MISTAKE_TIPS, rep_mistakes
+
+# Mistake bitmasks are unsigned 32-bit integers
+MAX_MISTAKES = 32
+
+
+class Vocabulary:
+    """
+    Interns strings to small integer codes. Decoding hands back the one interned string
+    object, so thousands of decoded reps share their state and mistake strings.
+    """
+
+    __slots__ = ("names", "codes", "limit")
+
+    def __init__(self, names=(), limit=None):
+        self.names = []
+        self.codes = {}
+        self.limit = limit
+        for name in names:
+            self.code(name)
+
+    def code(self, name):
+        code = self.codes.get(name)
+        if code is None:
+            if self.limit is not None and len(self.names) >= self.limit:
+                raise ValueError(f"more than {self.limit} distinct values, cannot intern {name!r}")
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    def __len__(self):
+        return len(self.names)
+
+
+# Bit of the mistakes the pose analysis does not know, their text is kept apart in `SessionReps.other`
+OTHER_MISTAKE = "Other mistake"
+
+STATES = Vocabulary(("CORRECT", "IMPROPER", "FAILED"), limit=127)
+# Fixed: a free-form mistake must not take one of the 32 bits for good
+MISTAKES = Vocabulary((*MISTAKE_TIPS, OTHER_MISTAKE), limit=MAX_MISTAKES)
+OTHER = MISTAKES.codes[OTHER_MISTAKE]
+
+
+def mistake_mask(mistakes):
+    """Bitmask of `mistakes`, every mistake outside `MISTAKES` sets the `OTHER` bit."""
+    mask = 0
+    for mistake in mistakes:
+        mask |= 1 << MISTAKES.codes.get(mistake, OTHER)
+    return mask
+
+
+def mask_mistakes(mask):
+    """The interned mistake strings of `mask`, in code order, without `OTHER_MISTAKE`."""
+    names = MISTAKES.names
+    return [names[code] for code in range(len(names)) if mask >> code & 1 and code != OTHER]
+
+
+class SessionReps:
+    """
+    One session's "Squat Performance Analysis" packed into three arrays: repetition numbers
+    (2 bytes), state codes (1 byte) and mistake bitmasks (4 bytes) per rep, instead of a
+    dict, a list and a handful of string references.
+
+    A bitmask keeps which mistakes a rep had but not their order, so `to_json()` lists them in
+    vocabulary order and drops duplicates. Mistakes outside `MISTAKES` set the `OTHER` bit and
+    are kept as text in `other`, rep index -> list, and listed after the known ones.
+    """
+
+    __slots__ = ("session", "date", "repetitions", "states", "masks", "other")
+
+    def __init__(self, session=None, date=None, repetitions=None, states=None, masks=None, other=None):
+        self.session = session
+        self.date = date
+        self.repetitions = repetitions if repetitions is not None else array("H")
+        self.states = states if states is not None else array("b")
+        self.masks = masks if masks is not None else array("I")
+        self.other = other if other is not None else {}
+
+    @classmethod
+    def from_json(cls, reps, session=None, date=None):
+        packed = cls(session, date)
+        for i, rep in enumerate(reps):
+            packed.append(rep.get("repetition", i), rep.get("state"), rep_mistakes(rep))
+        return packed
+
+    @classmethod
+    def from_session(cls, entry):
+        """From a history entry `{"session", "date", "performance"}`."""
+        return cls.from_json(entry.get("performance", []), entry.get("session"), entry.get("date"))
+
+    def append(self, repetition, state, mistakes=()):
+        mask = mistake_mask(mistakes)
+        if mask >> OTHER & 1:
+            self.other[len(self.states)] = list(dict.fromkeys(m for m in mistakes if m not in MISTAKES.codes))
+        self.repetitions.append(repetition)
+        self.states.append(STATES.code(state))
+        self.masks.append(mask)
+
+    def __len__(self):
+        return len(self.states)
+
+    def rep(self, i, key="feedback"):
+        return {
+            "repetition": self.repetitions[i],
+            "state": STATES.names[self.states[i]],
+            key: mask_mistakes(self.masks[i]) + self.other.get(i, []),
+        }
+
+    def to_json(self, key="feedback"):
+        """
+        The reps in their JSON shape. `key` is "feedback", or "mistakes" for llm-deep.py.
+        """
+        return [self.rep(i, key) for i in range(len(self))]
+
+    def to_session(self, key="feedback"):
+        return {"session": self.session, "date": self.date, "performance": self.to_json(key)}
+
+    def state_counts(self):
+        """Reps per state code, a list indexed like `STATES.names`."""
+        counts = [0] * len(STATES)
+        for state in self.states:
+            counts[state] += 1
+        return counts
+
+    @property
+    def nbytes(self):
+        return sum(column.itemsize * len(column) for column in (self.repetitions, self.states, self.masks))
+
+
+class CompactHistory:
+    """A user's sessions as `SessionReps`, oldest first."""
+
+    __slots__ = ("sessions",)
+
+    def __init__(self, sessions=None):
+        self.sessions = sessions or []
+
+    @classmethod
+    def from_json(cls, history):
+        """From a `feedback_history` / "History Performance" list."""
+        return cls([SessionReps.from_session(entry) for entry in history])
+
+    def append(self, entry):
+        self.sessions.append(entry if isinstance(entry, SessionReps) else SessionReps.from_session(entry))
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __iter__(self):
+        return iter(self.sessions)
+
+    def latest(self, n):
+        return self.sessions[-n:] if n else []
+
+    def to_json(self, key="feedback"):
+        return [session.to_session(key) for session in self.sessions]
+
+    @property
+    def nbytes(self):
+        return sum(session.nbytes for session in self.sessions)
@@ -0,0 +1,112 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from ollama_client import get_client
+
+
+def prefix_key(user_id, model, prefix):
+    return user_id, model, hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+
+
+class ContextStore:
+    """
+    Per-user store of the Ollama `context` returned after the shared prompt prefix
+    (profile and session performance), so follow-up prompts for the same user can skip
+    re-processing it.
+
+    Parameters:
+        max_tokens (int): Total number of context tokens kept across all users, least recently
+            used entries are evicted first.
+        max_age (float): Seconds after which a context is dropped.
+    """
+
+    def __init__(self, max_tokens=2_000_000, max_age=30 * 60):
+        self.max_tokens = max_tokens
+        self.max_age = max_age
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._entries = OrderedDict()
+        self._tokens = 0
+        self._lock = threading.Lock()
+
+    def _drop(self, key):
+        context, _ = self._entries.pop(key)
+        self._tokens -= len(context)
+        self.stats["evictions"] += 1
+
+    def get(self, user_id, model, prefix):
+        key = prefix_key(user_id, model, prefix)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[1] > self.max_age:
+                if entry is not None:
+                    self._drop(key)
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[0]
+
+    def put(self, user_id, model, prefix, context):
+        key = prefix_key(user_id, model, prefix)
+        with self._lock:
+            if key in self._entries:
+                self._tokens -= len(self._entries.pop(key)[0])
+            self._entries[key] = (list(context), time.time())
+            self._tokens += len(context)
+            while self._tokens > self.max_tokens and len(self._entries) > 1:
+                self._drop(next(iter(self._entries)))
+
+    def forget_user(self, user_id):
+        """Drop every context of a user, e.g. after their profile changed."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                self._drop(key)
+
+    def evict_expired(self):
+        cutoff = time.time() - self.max_age
+        with self._lock:
+            for key in [key for key, (_, created) in self._entries.items() if created < cutoff]:
+                self._drop(key)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def prime(store, user_id, model, prefix, client=None, keep_alive="30m"):
+    """
+    Return the context for `prefix`, prefilling it on the model once if the store has none.
+
+    The prefix is sent with `num_predict: 1`, so the model processes it but generates only one
+    token, which is stripped from the returned context: the context covers the (templated)
+    prefix and an empty answer.
+    """
+    context = store.get(user_id, model, prefix)
+    if context is None:
+        client = client or get_client()
+        body = client.generate(model, prefix, options={"num_predict": 1}, keep_alive=keep_alive)
+        context = body["context"]
+        generated = body.get("eval_count", 0)
+        if generated:
+            context = context[:-generated]
+        store.put(user_id, model, prefix, context)
+    return context
+
+
+def stream_follow_up(store, user_id, model, prefix, prompt, client=None, options=None, keep_alive="30m"):
+    """
+    Stream a prompt that continues the shared `prefix` of a user, e.g. the personal
+    motivation request after the performance feedback request.
+
+    Yields the Ollama chunks of the follow-up generation.
+    """
+    client = client or get_client()
+    context = prime(store, user_id, model, prefix, client, keep_alive)
+    yield from client.stream_generate(model, prompt, context=context, options=options, keep_alive=keep_alive)
+
+
+def follow_up(store, user_id, model, prefix, prompt, client=None, options=None, keep_alive="30m"):
+    """Like `stream_follow_up` but returns the full response text."""
+    return "".join(body.get("response", "") for body in
+                   stream_follow_up(store, user_id, model, prefix, prompt, client, options, keep_alive))
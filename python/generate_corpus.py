@@ -0,0 +1,149 @@
+import argparse
+import gzip
+import io
+import json
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from generate_variety_case import generate_case
+from generate_variety_case_1 import generate_case_japanese
+
+GENERATORS = {
+    "generic": generate_case,
+    "japanese": generate_case_japanese,
+}
+
+
+def case_rng(seed, case_id):
+    """
+    RNG of a single case. Deriving it from the master seed and the Case ID makes every case
+    reproducible on its own, independent of which other cases are generated with it.
+    """
+    return random.Random(f"{seed}:{case_id}")
+
+
+def iter_cases(count, seed=None, variant="generic", start=1):
+    """
+    Lazily yield `count` cases starting at Case ID `start`.
+
+    With `seed=None` the global `random` module is used, like the generator scripts do.
+    """
+    make_case = GENERATORS[variant]
+    for case_id in range(start, start + count):
+        yield make_case(case_id, random if seed is None else case_rng(seed, case_id))
+
+
+def shard_ranges(count, shards, start=1):
+    """Split Case IDs `start .. start + count - 1` into `shards` contiguous (start, count) ranges."""
+    if shards < 1 or count < 0:
+        raise ValueError(f"need shards >= 1 and count >= 0, got shards={shards}, count={count}")
+    size, extra = divmod(count, shards)
+    ranges = []
+    for shard in range(shards):
+        shard_count = size + (shard < extra)
+        ranges.append((start, shard_count))
+        start += shard_count
+    return ranges
+
+
+def shard_path(prefix, shard, shards, compress=False):
+    return f"{prefix}-{shard:05d}-of-{shards:05d}.jsonl" + (".gz" if compress else "")
+
+
+def open_output(path):
+    if path.endswith(".gz"):
+        # a fixed mtime keeps compressed shards byte-identical between runs
+        return io.TextIOWrapper(gzip.GzipFile(path, "wb", mtime=0), encoding="utf-8")
+    return open(path, "w", encoding="utf-8")
+
+
+def to_jsonl(case):
+    return json.dumps(case, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def write_jsonl(cases, path):
+    """Write cases one JSON object per line, gzip-compressed if `path` ends in .gz. Returns the line count."""
+    written = 0
+    with open_output(path) as f:
+        for case in cases:
+            f.write(to_jsonl(case))
+            written += 1
+    return written
+
+
+def render_chunk(chunk):
+    """Worker entry point: the JSONL text of one (variant, seed, start, count) chunk."""
+    variant, seed, start, count = chunk
+    return "".join(to_jsonl(case) for case in iter_cases(count, seed, variant, start))
+
+
+def render_chunks(chunks, workers):
+    """Yield the rendered chunks in order, keeping at most `2 * workers` of them in flight."""
+    if workers <= 1:
+        yield from map(render_chunk, chunks)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+            pending.append(pool.submit(render_chunk, chunk))
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_corpus(prefix, count, seed=None, variant="generic", shards=1, compress=False, workers=1,
+                 chunk_size=10_000):
+    """
+    Generate `count` cases into `shards` JSONL files.
+
+    Each shard is cut into chunks of `chunk_size` cases. With `workers > 1` the chunks are
+    generated in a process pool and written back in Case ID order; because every case has its
+    own seeded RNG the files are byte-identical whatever the number of workers. Memory use
+    is bounded by the chunks in flight, not by `count`.
+
+    Returns:
+        list: The paths of the written shards, in Case ID order.
+    """
+    if workers > 1 and seed is None:
+        raise ValueError("a seed is required to generate a corpus with several workers")
+
+    chunks = []
+    paths = []
+    for shard, (start, shard_count) in enumerate(shard_ranges(count, shards)):
+        paths.append(shard_path(prefix, shard, shards, compress))
+        for offset in range(0, shard_count, chunk_size):
+            chunks.append((shard, (variant, seed, start + offset, min(chunk_size, shard_count - offset))))
+
+    # every shard gets a file, even one without cases
+    files = [open_output(path) for path in paths]
+    try:
+        for (shard, _), text in zip(chunks, render_chunks([chunk for _, chunk in chunks], workers)):
+            files[shard].write(text)
+    finally:
+        for f in files:
+            f.close()
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic squat feedback cases to JSONL shards")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=None, help="master seed, makes the corpus reproducible")
+    parser.add_argument("--variant", choices=sorted(GENERATORS), default="generic")
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--gzip", action="store_true", help="compress the shards")
+    parser.add_argument("--output", default="cases", help="path prefix of the shard files")
+    parser.add_argument("--workers", type=int, default=1, help="generate in a process pool, requires --seed")
+    args = parser.parse_args()
+    if args.count < 0:
+        parser.error("--count must be >= 0")
+    if args.shards < 1:
+        parser.error("--shards must be >= 1")
+    if args.workers < 1:
+        parser.error("--workers must be >= 1")
+
+    for path in write_corpus(args.output, args.count, args.seed, args.variant, args.shards, args.gzip,
+                             args.workers):
+        print(path)
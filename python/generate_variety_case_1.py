@@ -1,8 +1,9 @@
+import json
 import random
 
 
 # Function to generate "Greatest Achievement"
-def generate_greatest_achievement():
+def generate_greatest_achievement(rng=random):
     achievements = [
         "Successfully completed a 10 km run in under an hour",
         "Achieved a personal best squat of {} kg",
@@ -16,13 +17,13 @@ def generate_greatest_achievement():
         "Successfully maintained a regular exercise schedule for {} weeks without skipping a session"
     ]
     # Generate random parameters
-    weight_loss = random.randint(5, 20)
-    squat_weight = random.randint(50, 150)
-    months = random.randint(1, 12)
-    pushups = random.randint(20, 100)
-    cycling_hours = random.randint(2, 8)
-    muscle_gain = random.randint(1, 10)
-    weeks_consistent = random.randint(4, 24)
+    weight_loss = rng.randint(5, 20)
+    squat_weight = rng.randint(50, 150)
+    months = rng.randint(1, 12)
+    pushups = rng.randint(20, 100)
+    cycling_hours = rng.randint(2, 8)
+    muscle_gain = rng.randint(1, 10)
+    weeks_consistent = rng.randint(4, 24)
 
     # Fill placeholders
     filled_achievements = [
@@ -37,7 +38,7 @@ def generate_greatest_achievement():
         achievements[8].format(muscle_gain, months),
         achievements[9].format(weeks_consistent)
     ]
-    return random.choice(filled_achievements)
+    return rng.choice(filled_achievements)
 
 
 # Nama Jepang umum berdasarkan gender
@@ -46,12 +47,12 @@ female_names = ["Yui", "Aiko", "Sakura", "Miyu", "Hana", "Emi", "Rina", "Nao", "
 
 
 # Function to generate user data with Japanese characteristics
-def generate_japanese_user(case_id):
-    gender = random.choice(["Male", "Female"])
-    name = random.choice(male_names) if gender == "Male" else random.choice(female_names)
-    age = random.randint(18, 60)  # Typical active age range
-    height = random.randint(150, 180) if gender == "Male" else random.randint(140, 170)  # Average height in cm
-    weight = random.randint(50, 80) if gender == "Male" else random.randint(40, 70)  # Average weight in kg
+def generate_japanese_user(case_id, rng=random):
+    gender = rng.choice(["Male", "Female"])
+    name = rng.choice(male_names) if gender == "Male" else rng.choice(female_names)
+    age = rng.randint(18, 60)  # Typical active age range
+    height = rng.randint(150, 180) if gender == "Male" else rng.randint(140, 170)  # Average height in cm
+    weight = rng.randint(50, 80) if gender == "Male" else rng.randint(40, 70)  # Average weight in kg
 
     return {
         "Name": f"{name}_{case_id}",
@@ -63,15 +64,15 @@ def generate_japanese_user(case_id):
 
 
 # Function to generate a single case with Japanese population characteristics
-def generate_case_japanese(case_id):
+def generate_case_japanese(case_id, rng=random):
     # Generate user identification with Japanese characteristics
-    user_identification = generate_japanese_user(case_id)
+    user_identification = generate_japanese_user(case_id, rng)
 
     # Exercise objectives, habits, and preferences
     user_personalization = {
         "User Identification": user_identification,
         "Exercise Objectives": {
-            "Main Objective": random.sample([
+            "Main Objective": rng.sample([
                 "Increase muscle strength",
                 "Lose weight",
                 "Improve cardiovascular fitness",
@@ -79,74 +80,74 @@ def generate_case_japanese(case_id):
                 "Injury rehabilitation",
                 "Preparing for competitions",
                 "Improve mental health"
-            ], random.randint(1, 2)),
-            "Timeframe": random.choice(["1-3 months", "3-6 months", "6-12 months", "More than 12 months"]),
-            "Past Goals": random.choice(["Yes", "No"]),
-            "Past Goals Result": random.choice(["Achieved", "Failed", "N/A"])
+            ], rng.randint(1, 2)),
+            "Timeframe": rng.choice(["1-3 months", "3-6 months", "6-12 months", "More than 12 months"]),
+            "Past Goals": rng.choice(["Yes", "No"]),
+            "Past Goals Result": rng.choice(["Achieved", "Failed", "N/A"])
         },
         "Discipline & Exercise Habits": {
-            "Weekly Frequency": random.choice(["1 time", "2-3 times", "4-5 times", "Every day"]),
-            "Duration": random.choice(["<30 minutes", "30-60 minutes", "60-90 minutes", ">90 minutes"]),
-            "Regular Schedule": random.choice(["Yes", "No"]),
-            "Consistency Difficulty": random.choice(
+            "Weekly Frequency": rng.choice(["1 time", "2-3 times", "4-5 times", "Every day"]),
+            "Duration": rng.choice(["<30 minutes", "30-60 minutes", "60-90 minutes", ">90 minutes"]),
+            "Regular Schedule": rng.choice(["Yes", "No"]),
+            "Consistency Difficulty": rng.choice(
                 ["Very difficult", "Somewhat difficult", "Neutral", "Somewhat easy", "Very easy"]),
         },
         "Exercise Preferences": {
-            "Preferred Exercise": random.sample([
+            "Preferred Exercise": rng.sample([
                 "Weightlifting",
                 "Cardio",
                 "Yoga or Pilates",
                 "HIIT",
                 "Team sports",
                 "Home workouts"
-            ], random.randint(1, 2)),
-            "Group Preference": random.choice(["Individual", "Small group", "Large group"]),
-            "Variety Importance": random.choice(
+            ], rng.randint(1, 2)),
+            "Group Preference": rng.choice(["Individual", "Small group", "Large group"]),
+            "Variety Importance": rng.choice(
                 ["Very important", "Quite important", "Not too important", "Not important at all"]),
         },
         "Progress and Achievements": {
-            "Participated Structured Program": random.choice(["Yes", "No"]),
-            "Progress Result": random.choice(["Very good", "Good", "Fair", "Poor", "N/A"]),
-            "Greatest Achievement": generate_greatest_achievement()
+            "Participated Structured Program": rng.choice(["Yes", "No"]),
+            "Progress Result": rng.choice(["Very good", "Good", "Fair", "Poor", "N/A"]),
+            "Greatest Achievement": generate_greatest_achievement(rng)
         },
         "Intrinsic and Extrinsic Motivation": {
-            "Main Reason": random.sample([
+            "Main Reason": rng.sample([
                 "For long-term health",
                 "For physical appearance",
                 "To reduce stress or anxiety",
                 "To increase energy",
                 "To gain social recognition"
-            ], random.randint(1, 2)),
-            "Motivation Type": random.choice(["External rewards", "Internal satisfaction", "Both in balance"]),
-            "Support Need": random.choice(["Yes", "No", "Not sure"])
+            ], rng.randint(1, 2)),
+            "Motivation Type": rng.choice(["External rewards", "Internal satisfaction", "Both in balance"]),
+            "Support Need": rng.choice(["Yes", "No", "Not sure"])
         },
         "Mental Health and Emotions": {
-            "Emotional State": random.choice(["Very good", "Good", "Fair", "Bad", "Very bad"]),
-            "Stress Level": random.choice(["Never", "Sometimes", "Often", "Very often"]),
-            "Exercise Helps Stress": random.choice(["Yes", "No", "Not sure"]),
+            "Emotional State": rng.choice(["Very good", "Good", "Fair", "Bad", "Very bad"]),
+            "Stress Level": rng.choice(["Never", "Sometimes", "Often", "Very often"]),
+            "Exercise Helps Stress": rng.choice(["Yes", "No", "Not sure"]),
         },
         "Social Support": {
-            "Supportive Friends/Family": random.choice(["Yes", "No"]),
-            "Training with Others": random.choice(["Always", "Sometimes", "Rarely", "Never"]),
-            "Support Importance": random.choice(
+            "Supportive Friends/Family": rng.choice(["Yes", "No"]),
+            "Training with Others": rng.choice(["Always", "Sometimes", "Rarely", "Never"]),
+            "Support Importance": rng.choice(
                 ["Very important", "Quite important", "Not very important", "Not important at all"]),
         },
         "Medical History and Physical Condition": {
-            "Injury History": random.choice(["None", "Minor injury", "Major injury"]),
-            "Current Medication": random.choice(["Yes", "No"]),
-            "Respiratory/Cardiovascular Issues": random.choice(["Yes", "No"]),
+            "Injury History": rng.choice(["None", "Minor injury", "Major injury"]),
+            "Current Medication": rng.choice(["Yes", "No"]),
+            "Respiratory/Cardiovascular Issues": rng.choice(["Yes", "No"]),
         },
     }
 
     # Squat performance generation
     squat_performance = []
     if case_id % 7 in [0, 1]:  # All CORRECT or FAILED
-        state = "CORRECT" if random.random() > 0.5 else "FAILED"
-        for i in range(random.randint(5, 10)):
+        state = "CORRECT" if rng.random() > 0.5 else "FAILED"
+        for i in range(rng.randint(5, 10)):
             squat_performance.append({"repetition": i, "state": state, "feedback": []})
     else:
-        for i in range(random.randint(5, 10)):
-            state = random.choice(["CORRECT", "IMPROPER", "FAILED"])
+        for i in range(rng.randint(5, 10)):
+            state = rng.choice(["CORRECT", "IMPROPER", "FAILED"])
             feedback = []
             if state != "CORRECT":
                 feedback_pool = [
@@ -155,7 +156,7 @@ def generate_case_japanese(case_id):
                     "Your knees are too low, making them closer to your toes",
                     "Your thighs drop too below your knees"
                 ]
-                feedback = random.sample(feedback_pool, random.randint(1, 2))
+                feedback = rng.sample(feedback_pool, rng.randint(1, 2))
                 if "Your back is leaning too forward" in feedback and "Your back is not forward enough" in feedback:
                     feedback.remove("Your back is not forward enough")
             squat_performance.append({"repetition": i, "state": state, "feedback": feedback})
@@ -172,7 +173,7 @@ def generate_cases_japanese(num_cases):
     return [generate_case_japanese(i) for i in range(1, num_cases + 1)]
 
 
-# Example usage
-cases = generate_cases_japanese(10)
-for case in cases:
-    print(case)
+# Example usage, see generate_corpus.py for large or reproducible corpora
+if __name__ == "__main__":
+    for case_id in range(1, 10 + 1):
+        print(json.dumps(generate_case_japanese(case_id)))
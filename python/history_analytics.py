@@ -0,0 +1,189 @@
+import numpy as np
+
+from compact_reps import MISTAKES, STATES, SessionReps
+
+# Sessions with a motivation score needed before a correlation is reported
+MIN_CORRELATION_SESSIONS = 3
+# |r| below this is reported as no clear link
+WEAK_CORRELATION = 0.3
+
+
+def _session_reps(session):
+    return session if isinstance(session, SessionReps) else SessionReps.from_session(session)
+
+
+def pack(histories, scores=None):
+    """
+    Flatten the sessions of many users into flat NumPy arrays.
+
+    Parameters:
+        histories (dict): user id -> sessions, oldest first. A session is a history entry
+            (`{"session", "date", "performance"[, "motivation_score"]}`) or a `SessionReps`.
+        scores (dict): user id -> {session id: motivation_score}, for scores kept apart from
+            the sessions (e.g. "Feedback User").
+
+    Returns:
+        dict: Per rep `state`, `mask` and `session` index; per session `user` index, `reps`,
+        `score` (NaN when unrated) and `id`; and the list of `users`.
+    """
+    users, session_ids, session_users, session_scores = [], [], [], []
+    states, masks, rep_counts = [], [], []
+    for user_index, (user_id, sessions) in enumerate(histories.items()):
+        users.append(user_id)
+        user_scores = (scores or {}).get(user_id, {})
+        for session in sessions:
+            packed = _session_reps(session)
+            score = session.get("motivation_score") if isinstance(session, dict) else None
+            score = user_scores.get(packed.session, score)
+            session_ids.append(packed.session)
+            session_users.append(user_index)
+            session_scores.append(np.nan if score is None else score)
+            rep_counts.append(len(packed))
+            states.append(np.frombuffer(packed.states, dtype=np.int8))
+            masks.append(np.frombuffer(packed.masks, dtype=np.uint32))
+
+    reps = np.array(rep_counts, dtype=np.int64)
+    return {
+        "users": users,
+        "id": session_ids,
+        "user": np.array(session_users, dtype=np.int64),
+        "score": np.array(session_scores, dtype=np.float64),
+        "reps": reps,
+        "state": np.concatenate(states) if states else np.zeros(0, np.int8),
+        "mask": np.concatenate(masks) if masks else np.zeros(0, np.uint32),
+        "session": np.repeat(np.arange(len(reps)), reps),
+    }
+
+
+def _group_sum(groups, n_groups, matrix):
+    """Column sums of `matrix` rows grouped by `groups`."""
+    return np.stack([np.bincount(groups, matrix[:, j], n_groups) for j in range(matrix.shape[1])], axis=1)
+
+
+def _grouped_correlation(groups, n_groups, x, y):
+    """Pearson r of x and y within every group, NaN pairs skipped, NaN when undefined."""
+    valid = ~(np.isnan(x) | np.isnan(y))
+    g, x, y = groups[valid], x[valid], y[valid]
+    n = np.bincount(g, minlength=n_groups).astype(np.float64)
+    sx, sy = np.bincount(g, x, n_groups), np.bincount(g, y, n_groups)
+    sxx, syy, sxy = np.bincount(g, x * x, n_groups), np.bincount(g, y * y, n_groups), np.bincount(g, x * y, n_groups)
+    spread = (n * sxx - sx * sx) * (n * syy - sy * sy)
+    # a constant series has no correlation; rounding can leave a tiny spread instead of 0
+    defined = (n >= MIN_CORRELATION_SESSIONS) & (spread > 1e-12)
+    r = np.full(n_groups, np.nan)
+    r[defined] = np.clip((n * sxy - sx * sy)[defined] / np.sqrt(spread[defined]), -1.0, 1.0)
+    return r
+
+
+def analyze(packed):
+    """
+    All statistics of a packed cohort in one vectorized pass, without a Python loop over reps.
+
+    Returns:
+        dict: For every session, `rates` (n_sessions, n_states) and `mistakes` (n_sessions,
+        n_mistakes) counts, and `deltas`, the change of `rates` since the user's previous
+        session (NaN for a first session); for every user, `user_rates`, `user_mistakes`,
+        `user_sessions` and `correlation`, the Pearson r between CORRECT rate and motivation_score.
+    """
+    n_sessions, n_users = len(packed["reps"]), len(packed["users"])
+    n_states, n_mistakes = len(STATES), len(MISTAKES)
+    session, state, user = packed["session"], packed["state"].astype(np.int64), packed["user"]
+
+    counts = np.bincount(session * n_states + state, minlength=n_sessions * n_states).reshape(n_sessions, n_states)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rates = counts / packed["reps"][:, None]
+
+    bits = (packed["mask"][:, None] >> np.arange(n_mistakes, dtype=np.uint32)) & 1
+    rep_index, mistake = np.nonzero(bits)
+    mistakes = np.bincount(session[rep_index] * n_mistakes + mistake,
+                           minlength=n_sessions * n_mistakes).reshape(n_sessions, n_mistakes)
+
+    deltas = np.full_like(rates, np.nan)
+    same_user = user[1:] == user[:-1]
+    deltas[1:][same_user] = rates[1:][same_user] - rates[:-1][same_user]
+
+    user_counts = _group_sum(user, n_users, counts).astype(np.int64)
+    user_reps = user_counts.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        user_rates = user_counts / user_reps[:, None]
+    user_mistakes = _group_sum(user, n_users, mistakes).astype(np.int64)
+
+    correct = STATES.codes["CORRECT"]
+    return {
+        "rates": rates,
+        "mistakes": mistakes,
+        "deltas": deltas,
+        "user_rates": user_rates,
+        "user_reps": user_reps,
+        "user_mistakes": user_mistakes,
+        "user_sessions": np.bincount(user, minlength=n_users),
+        "correlation": _grouped_correlation(user, n_users, rates[:, correct], packed["score"]),
+    }
+
+
+def _percent(rate):
+    return f"{rate * 100:.0f}%"
+
+
+def user_facts(packed, stats, user_index, max_mistakes=2):
+    """
+    Short statements about one user of an `analyze` result, ready to go into a prompt.
+    Sessions without reps have no rates and are left out.
+
+    Returns:
+        list: Fact strings, most general first.
+    """
+    sessions = np.flatnonzero(packed["user"] == user_index)
+    sessions = sessions[packed["reps"][sessions] > 0]
+    if not len(sessions):
+        return ["No previous sessions."]
+    names = STATES.names
+    rates, reps = stats["user_rates"][user_index], stats["user_reps"][user_index]
+    facts = [f"{len(sessions)} sessions, {reps} reps in total: "
+             + ", ".join(f"{_percent(rates[code])} {names[code]}" for code in range(len(names)) if rates[code] > 0)
+             + "."]
+
+    correct = STATES.codes["CORRECT"]
+    last = sessions[-1]
+    if len(sessions) > 1:
+        previous = stats["rates"][sessions[-2], correct]
+        # not stats["deltas"], an empty session may lie in between
+        delta = (stats["rates"][last, correct] - previous) * 100
+        facts.append(f"CORRECT rate of the latest session: {_percent(stats['rates'][last, correct])}, "
+                     f"{'up' if delta >= 0 else 'down'} {abs(delta):.0f} points from {_percent(previous)} "
+                     f"in the session before.")
+    session_reps = packed["reps"][sessions]
+    facts.append(f"Reps per session: {session_reps.mean():.0f} on average, {session_reps[-1]} in the latest session.")
+
+    mistakes = stats["user_mistakes"][user_index]
+    for code in np.argsort(-mistakes, kind="stable")[:max_mistakes]:
+        if mistakes[code]:
+            latest = stats["mistakes"][last, code]
+            facts.append(f"\"{MISTAKES.names[code]}\" in {mistakes[code]} reps ({_percent(mistakes[code] / reps)}), "
+                         f"{latest} of them in the latest session.")
+
+    r = stats["correlation"][user_index]
+    if np.isnan(r):
+        return facts
+    if abs(r) < WEAK_CORRELATION:
+        facts.append(f"Motivation scores show no clear link to the CORRECT rate (r={r:.2f}).")
+    else:
+        trend = "higher" if r > 0 else "lower"
+        facts.append(f"Motivation scores were {trend} after sessions with more CORRECT reps (r={r:.2f}).")
+    return facts
+
+
+def history_facts(sessions, scores=None):
+    """
+    Facts about a single user's sessions, oldest first.
+
+    Parameters:
+        sessions (list): History entries or `SessionReps`.
+        scores (dict): session id -> motivation_score, for scores not stored in the sessions.
+    """
+    packed = pack({None: sessions}, {None: scores or {}})
+    return user_facts(packed, analyze(packed), 0)
+
+
+def facts_text(facts):
+    return "\n".join(f"- {fact}" for fact in facts)
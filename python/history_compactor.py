@@ -0,0 +1,186 @@
+from collections import Counter, deque
+
+from rule_feedback import rep_mistakes
+
+STATES = ("CORRECT", "IMPROPER", "FAILED")
+
+
+class HistoryAggregate:
+    """
+    Running totals over sessions that are no longer sent to the model in full.
+
+    Every update is O(reps in the session), nothing is rescanned when a session is added.
+    The CORRECT-rate trend is a least-squares slope kept as running sums.
+    """
+
+    def __init__(self):
+        self.sessions = 0
+        self.first_date = None
+        self.last_date = None
+        self.state_counts = Counter()
+        self.mistake_counts = Counter()
+        self.score_sum = 0
+        self.score_count = 0
+        # sums for the slope of correct rate over session index
+        self._sx = self._sy = self._sxx = self._sxy = 0.0
+
+    def add_performance(self, session):
+        reps = session.get("performance", [])
+        correct = 0
+        for rep in reps:
+            self.state_counts[rep.get("state")] += 1
+            correct += rep.get("state") == "CORRECT"
+            self.mistake_counts.update(rep_mistakes(rep))
+
+        x, y = float(self.sessions), (correct / len(reps) if reps else 0.0)
+        self._sx += x
+        self._sy += y
+        self._sxx += x * x
+        self._sxy += x * y
+        self.sessions += 1
+        self.first_date = self.first_date or session.get("date")
+        self.last_date = session.get("date", self.last_date)
+
+    def add_feedback(self, feedback):
+        if feedback.get("motivation_score") is not None:
+            self.score_sum += feedback["motivation_score"]
+            self.score_count += 1
+
+    def correct_rate(self):
+        total = sum(self.state_counts.values())
+        return self.state_counts["CORRECT"] / total if total else None
+
+    def correct_rate_trend(self):
+        n = self.sessions
+        denominator = n * self._sxx - self._sx * self._sx
+        if n < 2 or denominator == 0:
+            return None
+        return (n * self._sxy - self._sx * self._sy) / denominator
+
+    def mean_motivation_score(self):
+        return self.score_sum / self.score_count if self.score_count else None
+
+    def summary(self):
+        """Short, prompt-ready view of the aggregate."""
+        rate = self.correct_rate()
+        trend = self.correct_rate_trend()
+        score = self.mean_motivation_score()
+        return {
+            "sessions": self.sessions,
+            "period": f"{self.first_date} - {self.last_date}",
+            "correct_rate": None if rate is None else round(rate, 2),
+            "correct_rate_trend_per_session": None if trend is None else round(trend, 3),
+            "reps": {state: self.state_counts[state] for state in STATES},
+            "mistakes": dict(self.mistake_counts.most_common()),
+            "mean_motivation_score": None if score is None else round(score, 2),
+        }
+
+    def to_dict(self):
+        return {
+            "sessions": self.sessions,
+            "first_date": self.first_date,
+            "last_date": self.last_date,
+            "state_counts": dict(self.state_counts),
+            "mistake_counts": dict(self.mistake_counts),
+            "score_sum": self.score_sum,
+            "score_count": self.score_count,
+            "sums": [self._sx, self._sy, self._sxx, self._sxy],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregate = cls()
+        aggregate.sessions = data["sessions"]
+        aggregate.first_date = data["first_date"]
+        aggregate.last_date = data["last_date"]
+        aggregate.state_counts = Counter(data["state_counts"])
+        aggregate.mistake_counts = Counter(data["mistake_counts"])
+        aggregate.score_sum = data["score_sum"]
+        aggregate.score_count = data["score_count"]
+        aggregate._sx, aggregate._sy, aggregate._sxx, aggregate._sxy = data["sums"]
+        return aggregate
+
+
+class HistoryCompactor:
+    """
+    Keep the last `keep_last` sessions of a user verbatim and fold older ones into a
+    `HistoryAggregate`, so the history part of the prompt has a bounded size.
+
+    Parameters:
+        keep_last (int): Number of most recent sessions sent to the model in full.
+    """
+
+    def __init__(self, keep_last=3):
+        self.keep_last = keep_last
+        self.performance = deque()
+        self.feedback = deque()
+        self.aggregate = HistoryAggregate()
+
+    def append(self, performance, feedback=None):
+        """
+        Add one finished session.
+
+        Parameters:
+            performance (dict): A "History Performance" entry ({"session", "date", "performance"}).
+            feedback (dict): The matching "Feedback User" entry ({"session", "date", "motivation",
+                "motivation_score"}), if the user rated the session.
+        """
+        self.performance.append(performance)
+        if feedback is not None:
+            self.feedback.append(feedback)
+
+        if len(self.performance) <= self.keep_last:
+            return
+        while len(self.performance) > self.keep_last:
+            self.aggregate.add_performance(self.performance.popleft())
+        # feedback of sessions that left the window is folded in as well
+        window = {session.get("session") for session in self.performance}
+        while self.feedback and self.feedback[0].get("session") not in window:
+            self.aggregate.add_feedback(self.feedback.popleft())
+
+    def add_feedback(self, feedback):
+        """Attach a rating that arrived after its session was appended."""
+        if any(session.get("session") == feedback.get("session") for session in self.performance):
+            self.feedback.append(feedback)
+        else:
+            self.aggregate.add_feedback(feedback)
+
+    def extend(self, history_performance, feedback_user=()):
+        by_session = {entry.get("session"): entry for entry in feedback_user}
+        for session in history_performance:
+            self.append(session, by_session.get(session.get("session")))
+
+    def prompt_sections(self):
+        """
+        Returns:
+            dict: "History Summary" (None until a session has been folded), and the recent
+            "History Performance" and "Feedback User" entries in full.
+        """
+        return {
+            "History Summary": self.aggregate.summary() if self.aggregate.sessions else None,
+            "History Performance": list(self.performance),
+            "Feedback User": list(self.feedback),
+        }
+
+    def to_dict(self):
+        return {
+            "keep_last": self.keep_last,
+            "performance": list(self.performance),
+            "feedback": list(self.feedback),
+            "aggregate": self.aggregate.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        compactor = cls(data["keep_last"])
+        compactor.performance = deque(data["performance"])
+        compactor.feedback = deque(data["feedback"])
+        compactor.aggregate = HistoryAggregate.from_dict(data["aggregate"])
+        return compactor
+
+
+def compact_history(history_performance, feedback_user=(), keep_last=3):
+    """Compact a full history in one call, see `HistoryCompactor.prompt_sections`."""
+    compactor = HistoryCompactor(keep_last)
+    compactor.extend(history_performance, feedback_user)
+    return compactor.prompt_sections()
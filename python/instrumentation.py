@@ -0,0 +1,230 @@
+import atexit
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Timing spans for the stages of a feedback generation. Everything is off unless enabled,
+# either with enable() or through the environment:
+#   FEEDBACK_TIMING=1            record the spans
+#   FEEDBACK_TIMING_LOG=1        also log every span as one JSON line on stderr
+#   FEEDBACK_TIMING_FILE=path    write the Prometheus text dump to `path` when the process exits
+STAGES = ("queue_wait", "data_load", "prompt_build", "request_send", "first_token", "last_token", "validate")
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+METRIC = "feedback_stage_seconds"
+
+ENABLED = False
+logger = logging.getLogger("feedback.timing")
+
+_histograms = {}
+_lock = threading.Lock()
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    def __init__(self, stage, labels):
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.stage, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class StreamTimer:
+    """
+    Times one streamed request: `request_send` when the response headers arrive, then
+    `first_token` and `last_token`, all measured from the moment the request was sent.
+    """
+
+    def __init__(self, **labels):
+        self.labels = labels
+        self.start = time.perf_counter()
+        self._waiting_first = True
+
+    def sent(self):
+        observe("request_send", time.perf_counter() - self.start, **self.labels)
+
+    def token(self):
+        if self._waiting_first:
+            self._waiting_first = False
+            observe("first_token", time.perf_counter() - self.start, **self.labels)
+
+    def done(self):
+        observe("last_token", time.perf_counter() - self.start, **self.labels)
+
+
+def span(stage, **labels):
+    """
+    Context manager timing `stage`. When timing is disabled this returns a shared no-op
+    object, so an instrumented block only costs one function call.
+    """
+    return Span(stage, labels) if ENABLED else _NOOP
+
+
+def stream_timer(**labels):
+    """A `StreamTimer`, or None when timing is disabled."""
+    return StreamTimer(**labels) if ENABLED else None
+
+
+def observe(stage, seconds, **labels):
+    """Record one measurement of `stage` in seconds."""
+    if not ENABLED:
+        return
+    key = (stage, tuple(sorted(labels.items())))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({"stage": stage, "seconds": round(seconds, 6), **labels}))
+
+
+def enable(log=False):
+    """
+    Start recording spans.
+
+    Parameters:
+        log (bool): Also write every span to stderr as a JSON line through the
+            `feedback.timing` logger, unless that logger already has a handler.
+    """
+    global ENABLED
+    ENABLED = True
+    if log and not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+def snapshot():
+    """
+    Returns:
+        dict: `{stage: {"count", "sum", "mean"}}` over all label values, for quick summaries.
+    """
+    summary = {}
+    with _lock:
+        for (stage, _), histogram in _histograms.items():
+            entry = summary.setdefault(stage, {"count": 0, "sum": 0.0})
+            entry["count"] += histogram.count
+            entry["sum"] += histogram.sum
+    for entry in summary.values():
+        entry["mean"] = entry["sum"] / entry["count"] if entry["count"] else 0.0
+    return summary
+
+
+def _label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def render_prometheus():
+    """Render all recorded spans as one histogram in the Prometheus text exposition format."""
+    lines = [f"# HELP {METRIC} Time spent in each stage of a feedback generation.",
+             f"# TYPE {METRIC} histogram"]
+    with _lock:
+        items = sorted(_histograms.items())
+        for (stage, labels), histogram in items:
+            labels = (("stage", stage),) + labels
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f"{METRIC}_bucket{_label_text(labels, [('le', repr(bound))])} {cumulative}")
+            lines.append(f"{METRIC}_bucket{_label_text(labels, [('le', '+Inf')])} {histogram.count}")
+            lines.append(f"{METRIC}_sum{_label_text(labels)} {histogram.sum!r}")
+            lines.append(f"{METRIC}_count{_label_text(labels)} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    """
+    Write the dump to `path`, e.g. for the node_exporter textfile collector. The file is
+    replaced atomically so a scraper never reads a half-written dump.
+    """
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        data = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_metrics_server(host="127.0.0.1", port=9464):
+    """
+    Serve the dump at `http://host:port/metrics` from a background thread.
+
+    Returns:
+        ThreadingHTTPServer: The running server, `shutdown()` stops it.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if os.getenv("FEEDBACK_TIMING", "0") not in ("", "0"):
+    enable(log=os.getenv("FEEDBACK_TIMING_LOG", "0") not in ("", "0"))
+    if os.getenv("FEEDBACK_TIMING_FILE"):
+        atexit.register(write_prometheus, os.getenv("FEEDBACK_TIMING_FILE"))
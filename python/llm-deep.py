@@ -1,10 +1,17 @@
+import argparse
+import asyncio
 import json
 import os
+import sys
+import time
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
 
-system_prompt = (
-    """
+from instrumentation import observe, stream_timer
+from prompt_templates import register
+
+# The instructions, filled with one user's context per request
+INSTRUCTIONS = """
     Based on the following context, create motivational messages/words to maintain and even increase the user's motivation to maintain the user's consistency in doing self-squat exercises to prevent the user from experiencing muscle weakness in old age.
 
     Keep your tone positive, empathetic, and encouraging. Generate the following data as the output that will be responded to:
@@ -15,128 +22,275 @@ system_prompt = (
     4. **suggestion**: based on the analysis of the input data from the user, suggest to the user the composition of the number of reps that the user can perform for the next session. Make it clear to increase, decrease, or stick with maximizing performance.
     
     context:
-    User Personalization:
-    "User Personalization": [
-      {"question": "Name", "answer": "Muhammad Irwan Yanwari"},
-      {"question": "Age", "answer": "35 years"},
-      {"question": "Gender", "answer": "Male"},
-      {"question": "Height", "answer": "165 cm"},
-      {"question": "Weight", "answer": "75 kg"},
-      {"question": "Do you have prior experience with squat training?", "answer": "No"},
-      {"question": "How often do you perform squat exercises per week?", "answer": "Never"},
-      {"question": "How many squat repetitions do you usually perform in one training session?", "answer": "Less than 10"},
-      {"question": "Do you have a fixed training routine or schedule?", "answer": "No"},
-      {"question": "How difficult is it for you to exercise consistently? (Scale 1-5, 1 = very easy, 5 = very difficult)", "answer": "8"},
-      {"question": "What other purposes do you have for squatting other than to prevent muscle weakening in old age?", "answer": "Increasing leg muscle strength"},
-      {"question": "What usually motivates you to keep training?", "answer": ["Receiving support from others", "Achieving set goals"]},
-      {"question": "How much do you rely on external motivation from a coach or system? (Scale 1-5, 1 = not at all, 5 = very much)", "answer": "1"},
-      {"question": "What type of motivation is most effective for you?", "answer": "Socializing or not doing it alone"},
-      {"question": "What is your biggest challenge in maintaining squat training consistency?", "answer": "Lack of motivation"},
-      {"question": "How do you usually overcome these challenges?", "answer": "Find a friend to do it together"},
-      {"question": "Do you have any injury history or health conditions that should be considered during squat exercises?", "answer": "No"},
-      {"question": "Do you experience pain or discomfort while performing squats?", "answer": "Yes"},
-      {"question": "How important is it for you to receive safety recommendations during training? (Scale 1-5, 1 = not important, 5 = very important)", "answer": "8"}
-    ]
-    
-    History of squat training sessions:
-    "History of Squat Training Session": []
-    
-    Current session of squat performance analysis:
-    "Squat Performance Analysis": [
-        {
-            "repetition": 0,
-            "state": "CORRECT",
-            "mistakes": []
-        },
-        {
-            "repetition": 1,
-            "state": "FAILED",
-            "mistakes": []
-        },
-        {
-            "repetition": 2,
-            "state": "FAILED",
-            "mistakes": [
-                "Your knees are too low, making them closer to your toes"
-            ]
-        },
-        {
-            "repetition": 3,
-            "state": "FAILED",
-            "mistakes": []
-        },
-        {
-            "repetition": 4,
-            "state": "CORRECT",
-            "mistakes": []
-        },
-        {
-            "repetition": 5,
-            "state": "FAILED",
-            "mistakes": [
-                "Your knees are too low, making them closer to your toes"
-            ]
-        },
-        {
-            "repetition": 6,
-            "state": "FAILED",
-            "mistakes": []
-        },
-        {
-            "repetition": 7,
-            "state": "FAILED",
-            "mistakes": []
-        },
-        {
-            "repetition": 8,
-            "state": "FAILED",
-            "mistakes": []
-        },
-        {
-            "repetition": 9,
-            "state": "FAILED",
-            "mistakes": []
-        }
-    ]
-    
-    Pre-exercise questionnaire:
-    [
-      {"question": "Do you have fever?", "answer": "No"},
-      {"question": "Does your body feel sluggish?", "answer": "No"},
-      {"question": "Did you get enough sleep yesterday?", "answer": "Yes"},
-      {"question": "Do you have an appetite?", "answer": "Yes"},
-      {"question": "Do you have diarrhoea?", "answer": "No"},
-      {"question": "Do you have headache or chest pain?", "answer": "No"},
-      {"question": "Are there any joint pains?", "answer": "No"},
-      {"question": "Are you overworked?", "answer": "No"},
-      {"question": "Are you still tired from your last sporting event?", "answer": "Yes"},
-      {"question": "How motivated are you to exercise today?", "answer": "5"}
-    ]
+    {context}
     
     ONLY OUTPUT RAW JSON. Use this structure:
-    {
+    {{
         "performance_feedback": str,
         "motivation": str,
         "safety": str,
         "susggestion": str
+    }}
+    """
+PROMPT = register("deep", INSTRUCTIONS)
+
+# The example user of the original script, sent when no --input is given
+DEFAULT_CONTEXT = """\
+User Personalization:
+"User Personalization": [
+  {"question": "Name", "answer": "Muhammad Irwan Yanwari"},
+  {"question": "Age", "answer": "35 years"},
+  {"question": "Gender", "answer": "Male"},
+  {"question": "Height", "answer": "165 cm"},
+  {"question": "Weight", "answer": "75 kg"},
+  {"question": "Do you have prior experience with squat training?", "answer": "No"},
+  {"question": "How often do you perform squat exercises per week?", "answer": "Never"},
+  {"question": "How many squat repetitions do you usually perform in one training session?", "answer": "Less than 10"},
+  {"question": "Do you have a fixed training routine or schedule?", "answer": "No"},
+  {"question": "How difficult is it for you to exercise consistently? (Scale 1-5, 1 = very easy, 5 = very difficult)", "answer": "8"},
+  {"question": "What other purposes do you have for squatting other than to prevent muscle weakening in old age?", "answer": "Increasing leg muscle strength"},
+  {"question": "What usually motivates you to keep training?", "answer": ["Receiving support from others", "Achieving set goals"]},
+  {"question": "How much do you rely on external motivation from a coach or system? (Scale 1-5, 1 = not at all, 5 = very much)", "answer": "1"},
+  {"question": "What type of motivation is most effective for you?", "answer": "Socializing or not doing it alone"},
+  {"question": "What is your biggest challenge in maintaining squat training consistency?", "answer": "Lack of motivation"},
+  {"question": "How do you usually overcome these challenges?", "answer": "Find a friend to do it together"},
+  {"question": "Do you have any injury history or health conditions that should be considered during squat exercises?", "answer": "No"},
+  {"question": "Do you experience pain or discomfort while performing squats?", "answer": "Yes"},
+  {"question": "How important is it for you to receive safety recommendations during training? (Scale 1-5, 1 = not important, 5 = very important)", "answer": "8"}
+]
+
+History of squat training sessions:
+"History of Squat Training Session": []
+
+Current session of squat performance analysis:
+"Squat Performance Analysis": [
+    {
+        "repetition": 0,
+        "state": "CORRECT",
+        "mistakes": []
+    },
+    {
+        "repetition": 1,
+        "state": "FAILED",
+        "mistakes": []
+    },
+    {
+        "repetition": 2,
+        "state": "FAILED",
+        "mistakes": [
+            "Your knees are too low, making them closer to your toes"
+        ]
+    },
+    {
+        "repetition": 3,
+        "state": "FAILED",
+        "mistakes": []
+    },
+    {
+        "repetition": 4,
+        "state": "CORRECT",
+        "mistakes": []
+    },
+    {
+        "repetition": 5,
+        "state": "FAILED",
+        "mistakes": [
+            "Your knees are too low, making them closer to your toes"
+        ]
+    },
+    {
+        "repetition": 6,
+        "state": "FAILED",
+        "mistakes": []
+    },
+    {
+        "repetition": 7,
+        "state": "FAILED",
+        "mistakes": []
+    },
+    {
+        "repetition": 8,
+        "state": "FAILED",
+        "mistakes": []
+    },
+    {
+        "repetition": 9,
+        "state": "FAILED",
+        "mistakes": []
     }
+]
+
+Pre-exercise questionnaire:
+[
+  {"question": "Do you have fever?", "answer": "No"},
+  {"question": "Does your body feel sluggish?", "answer": "No"},
+  {"question": "Did you get enough sleep yesterday?", "answer": "Yes"},
+  {"question": "Do you have an appetite?", "answer": "Yes"},
+  {"question": "Do you have diarrhoea?", "answer": "No"},
+  {"question": "Do you have headache or chest pain?", "answer": "No"},
+  {"question": "Are there any joint pains?", "answer": "No"},
+  {"question": "Are you overworked?", "answer": "No"},
+  {"question": "Are you still tired from your last sporting event?", "answer": "Yes"},
+  {"question": "How motivated are you to exercise today?", "answer": "5"}
+]
+"""
+
+
+def build_prompt(context):
+    """The full prompt for one user context, a string or JSON-serializable data."""
+    return PROMPT.render(context=context)
+
+
+system_prompt = build_prompt(DEFAULT_CONTEXT)
+
+
+DEEPSEEK_BASE_URL = "https://api.deepseek.com"
+DEFAULT_MODEL = "deepseek-reasoner"
+
+
+def make_client():
+    """
+    Async client for the DeepSeek API, or for any OpenAI-compatible server set in
+    $DEEPSEEK_BASE_URL (e.g. `ollama_stub.py`, whose chat endpoint lives under `/v1`).
+    """
+    load_dotenv()
+    return AsyncOpenAI(api_key=os.getenv("DEEPSEEK_API"), base_url=os.getenv("DEEPSEEK_BASE_URL", DEEPSEEK_BASE_URL))
+
+
+class RateLimiter:
+    """
+    Async limiter: at most `requests_per_second` request starts per second and at most
+    `max_concurrency` requests in flight. Use as `async with limiter:`.
+    """
+
+    def __init__(self, requests_per_second=None, max_concurrency=8):
+        self.interval = 1 / requests_per_second if requests_per_second else 0.0
+        self.max_concurrency = max_concurrency
+        self._next_start = 0.0
+        # created lazily so the limiter can be built outside of a running event loop
+        self._lock = None
+        self._slots = None
+
+    async def __aenter__(self):
+        if self._slots is None:
+            self._lock = asyncio.Lock()
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        await self._slots.acquire()
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            delay = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._slots.release()
+
+
+async def stream_completion(client, prompt, model=DEFAULT_MODEL, on_token=None):
     """
-)
+    Stream one chat completion, keeping the reasoning and the answer apart.
+
+    Parameters:
+        client (AsyncOpenAI): The API client.
+        prompt (str): The full prompt, see `build_prompt`, sent as the user message.
+        model (str): The name of the model to use.
+        on_token (callable): Called with `(kind, text)` for every delta, `kind` being
+            "reasoning_content" or "content".
+
+    Returns:
+        dict: `reasoning_content`, `content`, `ttft` (seconds to the first delta) and `total`.
+    """
+    parts = {"reasoning_content": [], "content": []}
+    timer = stream_timer(model=model)
+    start = time.perf_counter()
+    first = None
+    stream = await client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        stream=True
+    )
+    if timer:
+        timer.sent()
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        for kind in parts:
+            text = getattr(delta, kind, None)
+            if text:
+                if first is None:
+                    first = time.perf_counter()
+                    if timer:
+                        timer.token()
+                parts[kind].append(text)
+                if on_token:
+                    on_token(kind, text)
+    end = time.perf_counter()
+    if timer:
+        timer.done()
+    return {
+        "reasoning_content": "".join(parts["reasoning_content"]),
+        "content": "".join(parts["content"]),
+        "ttft": (first or end) - start,
+        "total": end - start,
+    }
+
+
+async def evaluate_contexts(contexts, model=DEFAULT_MODEL, client=None, limiter=None, on_token=None):
+    """
+    Run every user context concurrently under `limiter`, each in its own copy of the instructions.
+
+    Parameters:
+        contexts (list): User contexts, one string or JSON-serializable object per user.
+        model (str): The name of the model to use.
+        client (AsyncOpenAI): Defaults to `make_client()`.
+        limiter (RateLimiter): Defaults to 8 concurrent requests without a rate cap.
+        on_token (callable): Called with `(index, kind, text)` for every streamed delta.
+
+    Returns:
+        list: One result dict per context, in input order; a failed request has an `error` key instead.
+    """
+    client = client or make_client()
+    limiter = limiter or RateLimiter()
+
+    async def run(index, context):
+        callback = (lambda kind, text: on_token(index, kind, text)) if on_token else None
+        try:
+            queued = time.perf_counter()
+            async with limiter:
+                observe("queue_wait", time.perf_counter() - queued, model=model)
+                return await stream_completion(client, build_prompt(context), model, callback)
+        except Exception as e:
+            return {"error": str(e)}
+
+    return await asyncio.gather(*(run(index, context) for index, context in enumerate(contexts)))
+
 
-load_dotenv()
-client = OpenAI(
-    api_key=os.getenv("DEEPSEEK_API"),
-    base_url="https://api.deepseek.com",
-)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Motivational feedback from the DeepSeek reasoning model")
+    parser.add_argument("--input", help="JSON file with a list of user contexts (strings or objects), default: the built-in example")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=None, help="maximum requests started per second")
+    args = parser.parse_args()
 
-messages = [{"role": "user", "content": system_prompt}]
+    if args.input:
+        with open(args.input) as f:
+            contexts = json.load(f)
+    else:
+        contexts = [DEFAULT_CONTEXT]
 
-response = client.chat.completions.create(
-    model="deepseek-reasoner",
-    messages=messages
-)
+    on_token = None
+    if len(contexts) == 1:
+        # a single user: stream the reasoning to stderr and the answer to stdout as they arrive
+        def on_token(index, kind, text):
+            print(text, end="", flush=True, file=sys.stderr if kind == "reasoning_content" else sys.stdout)
 
-print(response)
-print(response.choices[0].message.content)
-print(response.choices[0].message.reasoning_content)
-# print(json.loads(response.choices[0].message.content))
\ No newline at end of file
+    results = asyncio.run(evaluate_contexts(contexts, args.model, limiter=RateLimiter(args.rate, args.concurrency),
+                                            on_token=on_token))
+    if on_token:
+        print()
+    else:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
@@ -1,84 +1,69 @@
+import argparse
 import json
-import subprocess
 import ollama
 
-PROMPT_TEMPLATE = """
-    **Task**: Generate structured exercise feedback in JSON format based on the following data:
-    
-    ### Input Data
-    1. User Profile:
-    {user_personalization}
-    
-    2. Current Session Analysis:
-    {squat_performance}
-    
-    3. Historical Feedback:
-    {history_feedback}
-    
-    ### Instructions
-    - Analyze ONLY repetitions with "IMPROPER" or "FAILED" states
-    - For each problematic repetition:
-      - Copy exact "repetition" number
-      - Keep original "state" value
-      - Combine all feedback points into one string separated by commas
-    - Create 3 motivational messages addressing:
-      1. Weight loss progress
-      2. Consistency encouragement
-      3. Specific form improvement
-    - Safety note should reference respiratory/cardiovascular history
-    
-    ### Required Output Format:
-    {{
-      "performance_feedback": [
-        {{
-          "rep": <repetition_number>,
-          "state": "<IMPROPER/FAILED>", 
-          "details": "<combined_feedback>"
-        }}
-      ],
-      "motivation": [
-        "<message1>",
-        "<message2>",
-        "<message3>"
-      ],
-      "safety": "<custom_health_note>"
-    }}
-    
-    ### Example Output:
-    {{
-      "performance_feedback": [
-        {{
-          "rep": 0,
-          "state": "IMPROPER",
-          "details": "Knees too low, Back not forward enough"
-        }}
-      ],
-      "motivation": [
-        "Your weight loss journey is inspiring...",
-        "Remember your 19kg achievement...",
-        "Focus on keeping knees aligned..."
-      ],
-      "safety": "Given your cardiovascular history..."
-    }}
-    
-    Now generate response for the provided data:
+from history_analytics import facts_text, history_facts
+from instrumentation import span, stream_timer
+from ollama_client import OllamaError
+from prompts import EVALUATED, MOTIVATION
+from rule_feedback import build_performance_feedback, summarize_mistakes
+from schema_guard import generate_validated
+from stream_parser import parse_response
+from user_store import UserStore
+
+
+def load_user_data(user_id=None, store=None):
+    """
+    The data of one user: from `store` if a user id is given, else the whole user_data.json.
     """
+    with span("data_load"):
+        if store is not None and user_id is not None:
+            data = store.user_data(user_id)
+            if data is None:
+                raise KeyError(f"Unknown user: {user_id}")
+            return data
+        with open('user_data.json') as f:
+            return json.load(f)
 
 
-def run_ollama(prompt_template, model="deepseek-r1"):
-    # Load and format JSON data
-    with open('user_data.json') as f:
-        data = json.load(f)
+def generate_streamed(**kwargs):
+    """
+    `ollama.generate`, streamed so that first_token and last_token are timed apart.
 
-    # Format the prompt with actual data sections
-    formatted_prompt = prompt_template.format(
-        user_personalization=json.dumps(data['user_personalization'], indent=2),
-        squat_performance=json.dumps(data['squat_performance'], indent=2),
-        history_feedback=json.dumps(data['feedback_history'], indent=2)
-    )
+    Returns:
+        dict: The joined `response`.
+    """
+    # the ollama package sends the request lazily, there is no separate request_send point
+    timer = stream_timer(model=kwargs.get('model'))
+    parts = []
+    for chunk in ollama.generate(stream=True, **kwargs):
+        if timer:
+            timer.token()
+        parts.append(chunk['response'])
+    if timer:
+        timer.done()
+    return {'response': ''.join(parts)}
+
+
+OPTIONS = {
+    'temperature': 0.5,
+    'top_p': 0.9,
+    'max_tokens': 35000,
+    'repeat_penalty': 1.1
+}
+
+
+def build_full_prompt(data, template=EVALUATED):
+    # Fill the precompiled template with the actual data sections
+    with span("prompt_build"):
+        formatted_prompt = template.render(
+            user_personalization=json.dumps(data['user_personalization'], indent=2),
+            squat_performance=json.dumps(data['squat_performance'], indent=2),
+            history_feedback=json.dumps(data['feedback_history'], indent=2)
+        )
 
     # Add system message prefix
-    full_prompt = f"""SYSTEM: You are a JSON output generator. Follow these rules:
+    return f"""SYSTEM: You are a JSON output generator. Follow these rules:
     1. Use only provided data
     2. Maintain original numerical values
     3. Never invent new data
@@ -86,40 +71,125 @@ def run_ollama(prompt_template, model="deepseek-r1"):
     
     USER: {formatted_prompt}"""
 
+
+def run_ollama(model="deepseek-r1", user_id=None, store=None, template=EVALUATED):
+    # Load and format JSON data
+    data = load_user_data(user_id, store)
+    full_prompt = build_full_prompt(data, template)
+
     # Run Ollama with adjusted parameters
     try:
-        response = ollama.generate(
-            model='deepseek-r1',
-            prompt=prompt_template,
+        response = generate_streamed(
+            model=model,
+            prompt=full_prompt,
+            options=OPTIONS
+        )
+        print(response['response'])
+        return response['response']
+    except ollama.ResponseError as e:
+        print("error")
+        return f"Error: {e}"
+
+
+def run_ollama_validated(model="deepseek-r1", user_id=None, store=None, template=EVALUATED, client=None):
+    """
+    Same prompt as `run_ollama`, generated with `schema_guard.generate_validated`: the stream is
+    cancelled as soon as it breaks the schema and missing sections are asked for one by one.
+
+    Parameters:
+        model (str): The name of the model to use.
+        user_id (str): Read this user from `store` instead of user_data.json.
+        store (UserStore): The user store.
+        template (CompiledTemplate): The feedback prompt.
+        client: `OllamaClient`, defaults to the shared one.
+
+    Returns:
+        str: The JSON response, or an error message.
+    """
+    data = load_user_data(user_id, store)
+    full_prompt = build_full_prompt(data, template)
+    # the retry prompts need only the personalization and the analysis, not the history
+    input_data = {**data['user_personalization'], **data['squat_performance']}
+    try:
+        result = generate_validated(model, full_prompt, input_data, client=client, options=OPTIONS)
+    except OllamaError as e:
+        return f"Error: {e}"
+    return json.dumps(result, indent=2)
+
+
+def run_ollama_fast(model="deepseek-r1", user_id=None, store=None):
+    """
+    Same output as `run_ollama`, but `performance_feedback` is built from the squat analysis
+    by rules and the model is only asked for `motivation` and `safety`.
+
+    Parameters:
+        model (str): The name of the model to use.
+        user_id (str): Read this user from `store` instead of user_data.json.
+        store (UserStore): The user store.
+
+    Returns:
+        str: The combined JSON response, or an error message.
+    """
+    data = load_user_data(user_id, store)
+
+    analysis = data['squat_performance']['Squat Performance Analysis']
+    with span("prompt_build"):
+        # the history goes in as precomputed facts, the current session is the latest one
+        sessions = data['feedback_history'] + [{'session': 'current', 'performance': analysis}]
+        prompt = MOTIVATION.render(
+            user_personalization=json.dumps(data['user_personalization'], indent=2),
+            session_summary=summarize_mistakes(analysis),
+            history_feedback=facts_text(history_facts(sessions))
+        )
+
+    try:
+        response = generate_streamed(
+            model=model,
+            prompt=prompt,
+            format='json',
             options={
                 'temperature': 0.5,
                 'top_p': 0.9,
-                'max_tokens': 35000,
                 'repeat_penalty': 1.1
             }
         )
-        print(response['response'])
-        return response['response']
-    except subprocess.CalledProcessError as e:
-        print("error")
-        return f"Error: {e.stderr}"
+    except ollama.ResponseError as e:
+        return f"Error: {e}"
+    generated = parse_response(response['response'])
+    if not isinstance(generated, dict):
+        return f"Error: unparseable response: {response['response']}"
+
+    return json.dumps({
+        "performance_feedback": build_performance_feedback(analysis),
+        "motivation": generated.get("motivation", []),
+        "safety": generated.get("safety", "")
+    }, indent=2)
 
 
 def validate_response(response):
-    try:
-        data = json.loads(response)
-        required_fields = ['performance_feedback', 'motivation', 'safety']
-        if not all(field in data for field in required_fields):
-            return False
-        return True
-    except json.JSONDecodeError:
+    # deepseek-r1 prefixes its answer with a <think>...</think> block, parse_response skips it
+    data = parse_response(response)
+    if not isinstance(data, dict):
         return False
+    required_fields = ['performance_feedback', 'motivation', 'safety']
+    return all(field in data for field in required_fields)
 
 
 # In main execution
 if __name__ == "__main__":
-    response = run_ollama(PROMPT_TEMPLATE)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fast", action="store_true", help="rule-based performance feedback, model for the rest")
+    parser.add_argument("--user", help="read this user from the user store instead of user_data.json")
+    parser.add_argument("--db", default="users.db", help="user store database, see user_store.py")
+    args = parser.parse_args()
+
+    store = UserStore(args.db) if args.user else None
+    if args.fast:
+        response = run_ollama_fast(user_id=args.user, store=store)
+    else:
+        response = run_ollama_validated(user_id=args.user, store=store)
     if validate_response(response):
-        print(response)
+        # the parsed response, without the reasoning block or a cut-off tail
+        print(json.dumps(parse_response(response), indent=2))
     else:
         print("Error: Invalid response format")
@@ -1,27 +1,23 @@
 import json
 import subprocess
+import sys
+import textwrap
+import time
 
+from history_compactor import compact_history
+from ollama_client import get_client
+from prompt_cache import cache_key
 
-def run_ollama(prompt_template, model="deepseek-r1"):
-    """
-    Run the LLaMA model locally using Ollama with a specific prompt and JSON data.
+KEEP_ALIVE = "30m"
+# Sessions sent to the model in full, older ones are folded into the history summary
+HISTORY_KEEP_LAST = 3
 
-    Parameters:
-        prompt_template (str): The template for the prompt.
-        json_data (dict): The JSON data to include in the prompt.
-        model (str): The name of the model to use.
 
-    Returns:
-        str: The model's response.
+def run_ollama_subprocess(prompt, model="deepseek-r1"):
+    """
+    Run the model through the `ollama run` CLI. Kept only as a fallback for machines
+    where the HTTP API is not reachable, every call forks a new process.
     """
-    # Format the JSON data as a string
-    # json_input = json.dumps(json_data, indent=4)
-
-
-    # Combine the prompt template with the JSON input
-    prompt = f"{prompt_template}"
-
-    # Run the Ollama command
     try:
         result = subprocess.run(
             ["ollama", "run", model],
@@ -35,9 +31,109 @@ def run_ollama(prompt_template, model="deepseek-r1"):
         return f"Error running the model: {e.stderr}"
 
 
+def run_ollama_http(prompt, model="deepseek-r1", keep_alive=KEEP_ALIVE, on_token=None, timings=None,
+                    client=None):
+    """
+    Stream the model response from the Ollama HTTP API.
+
+    Parameters:
+        prompt (str): The full prompt.
+        model (str): The name of the model to use.
+        keep_alive (str): How long Ollama keeps the model loaded after the call.
+        on_token (callable): Called with every token as soon as it arrives.
+        timings (dict): If given, filled with `ttft` (time to first token) and `total` in seconds.
+
+    Returns:
+        str: The model's response.
+    """
+    client = client or get_client()
+    parts = []
+    start = time.perf_counter()
+    first_token = None
+    for body in client.stream_generate(model, prompt, keep_alive=keep_alive):
+        token = body.get("response", "")
+        if token:
+            if first_token is None:
+                first_token = time.perf_counter()
+            parts.append(token)
+            if on_token:
+                on_token(token)
+    end = time.perf_counter()
+
+    if timings is not None:
+        timings["ttft"] = (first_token or end) - start
+        timings["total"] = end - start
+    return "".join(parts).strip()
+
+
+def history_section(history_performance, feedback_user=(), keep_last=HISTORY_KEEP_LAST):
+    """
+    The history part of the prompt, bounded in size however many sessions the user has done.
+
+    Parameters:
+        history_performance (list): Every "History Performance" session, oldest first.
+        feedback_user (list): The "Feedback User" entries of those sessions.
+        keep_last (int): Number of most recent sessions sent in full.
+
+    Returns:
+        str: A "History Summary" of the older sessions, if there are any, followed by the
+        recent "History Performance" and "Feedback User" entries.
+    """
+    sections = compact_history(history_performance, feedback_user, keep_last)
+    parts = []
+    if sections["History Summary"] is not None:
+        parts.append("- **History Summary** (sessions before the ones below):\n\n"
+                     + json.dumps(sections["History Summary"], indent=2, ensure_ascii=False))
+    parts.append("- **History Performance:**\n\n"
+                 + json.dumps(sections["History Performance"], indent=2, ensure_ascii=False))
+    parts.append("- **Feedback User:**\n\n" + json.dumps(sections["Feedback User"], indent=2, ensure_ascii=False))
+    return "\n\n".join(parts) + "\n"
+
+
+def run_ollama(prompt_template, model="deepseek-r1", backend="http", cache=None, **kwargs):
+    """
+    Run the model locally using Ollama with a specific prompt.
+
+    Parameters:
+        prompt_template (str): The prompt to send.
+        model (str): The name of the model to use.
+        backend (str): "http" (default) streams from the Ollama API, "subprocess" shells out to `ollama run`.
+        cache (PromptCache): If given, identical prompts for the same model are answered from the cache.
+        **kwargs: Extra arguments for `run_ollama_http` (keep_alive, on_token, timings).
+
+    Returns:
+        str: The model's response.
+    """
+    prompt = f"{prompt_template}"
+    if backend not in ("http", "subprocess"):
+        raise ValueError(f"Unknown backend: {backend}")
+
+    if cache is not None:
+        start = time.perf_counter()
+        key = cache_key(model, prompt)
+        response = cache.get(key)
+        if response is not None:
+            if kwargs.get("on_token"):
+                kwargs["on_token"](response)
+            if kwargs.get("timings") is not None:
+                kwargs["timings"]["ttft"] = kwargs["timings"]["total"] = time.perf_counter() - start
+            return response
+
+    if backend == "subprocess":
+        response = run_ollama_subprocess(prompt, model)
+        if response.startswith("Error running the model"):
+            return response
+    else:
+        response = run_ollama_http(prompt, model, **kwargs)
+
+    if cache is not None:
+        cache.set(key, response)
+    return response
+
+
 if __name__ == "__main__":
-    # Define the prompt template
-    PROMPT_TEMPLATE = (
+    # Define the prompt template, the history goes in between
+    PROMPT_HEAD = (
         """
         # Instructions
         
@@ -182,212 +278,10 @@ if __name__ == "__main__":
           ]
         }
         
-        - **History Performance:**
-        
-        [
-          {
-            "session": "s_001",
-            "date": "01/01/2025",
-            "performance": [
-              {
-                "repetition": 0,
-                "state": "CORRECT",
-                "feedback": []
-              },
-              {
-                "repetition": 1,
-                "state": "CORRECT",
-                "feedback": []
-              },
-              {
-                "repetition": 2,
-                "state": "CORRECT",
-                "feedback": []
-              },
-              {
-                "repetition": 3,
-                "state": "FAILED",
-                "feedback": [
-                  "Your back is not forward enough"
-                ]
-              },
-              {
-                "repetition": 4,
-                "state": "CORRECT",
-                "feedback": []
-              },
-              {
-                "repetition": 5,
-                "state": "IMPROPER",
-                "feedback": [
-                  "Your back is leaning too forward"
-                ]
-              },
-              {
-                "repetition": 6,
-                "state": "IMPROPER",
-                "feedback": [
-                  "Your thighs drop too below your knees",
-                  "Your back is not forward enough"
-                ]
-              },
-              {
-                "repetition": 7,
-                "state": "FAILED",
-                "feedback": [
-                  "Your knees are too low, making them closer to your toes",
-                  "Your back is not forward enough"
-                ]
-              }
-            ]
-          },
-          {
-            "session": "s_002",
-            "date": "03/01/2025",
-            "performance": [
-              {
-                "repetition": 0,
-                "state": "CORRECT",
-                "feedback": []
-              },
-              {
-                "repetition": 1,
-                "state": "CORRECT",
-                "feedback": []
-              },
-              {
-                "repetition": 2,
-                "state": "CORRECT",
-                "feedback": []
-              },
-              {
-                "repetition": 3,
-                "state": "FAILED",
-                "feedback": [
-                  "Your back is not forward enough"
-                ]
-              },
-              {
-                "repetition": 4,
-                "state": "CORRECT",
-                "feedback": []
-              },
-              {
-                "repetition": 5,
-                "state": "IMPROPER",
-                "feedback": [
-                  "Your back is leaning too forward"
-                ]
-              },
-              {
-                "repetition": 6,
-                "state": "IMPROPER",
-                "feedback": [
-                  "Your thighs drop too below your knees",
-                  "Your back is not forward enough"
-                ]
-              },
-              {
-                "repetition": 7,
-                "state": "FAILED",
-                "feedback": [
-                  "Your knees are too low, making them closer to your toes",
-                  "Your back is not forward enough"
-                ]
-              }
-            ]
-          },
-          {
-            "session": "s_003",
-            "date": "06/01/2025",
-            "performance": [
-              {
-                "repetition": 0,
-                "state": "CORRECT",
-                "feedback": []
-              },
-              {
-                "repetition": 1,
-                "state": "CORRECT",
-                "feedback": []
-              },
-              {
-                "repetition": 2,
-                "state": "CORRECT",
-                "feedback": []
-              },
-              {
-                "repetition": 3,
-                "state": "CORRECT",
-                "feedback": []
-              },
-              {
-                "repetition": 4,
-                "state": "CORRECT",
-                "feedback": []
-              },
-              {
-                "repetition": 5,
-                "state": "CORRECT",
-                "feedback": []
-              },
-              {
-                "repetition": 6,
-                "state": "CORRECT",
-                "feedback": []
-              },
-              {
-                "repetition": 7,
-                "state": "CORRECT",
-                "feedback": []
-              },
-              {
-                "repetition": 8,
-                "state": "CORRECT",
-                "feedback": []
-              },
-              {
-                "repetition": 9,
-                "state": "CORRECT",
-                "feedback": []
-              }
-            ]
-          }
-        ]
-        
-        - **Feedback User:**
-        
-        [
-          {
-            "session": "s_001",
-            "date": "01/01/2025",
-            "motivation": [
-              "You are doing great, Miyu_9! Remember your main objective of losing weight. Keep pushing yourself and you'll reach your goal in no time!",
-              "Great job on maintaining a consistent training schedule and variety in your workouts. This will help you achieve your fitness goals."
-            ],
-            "motivation_score": 4
-          },
-          {
-            "session": "s_002",
-            "date": "03/01/2025",
-            "motivation": [
-              "You're doing great on your weight loss journey! Remembering that every small step counts towards your goal of losing more weight is inspiring.",
-              "Keep pushing yourself and staying committed to your workout routine."
-            ],
-            "motivation_score": 2
-          },
-          {
-            "session": "s_003",
-            "date": "06/01/2025",
-            "motivation": [
-              "Your goal to lose weight is inspiring! Remember, every small step counts toward achieving your long-term objective. Your progress so far is very good, and you should be proud of yourself for sticking to your exercise routine.",
-              "You've shown that you can achieve significant weight loss with consistent training. Keep up the great work!",
-              "Your ability to choose cardio exercises aligns with your preferences, which is excellent for maintaining motivation. You're on the right track!"
-            ],
-            "motivation_score": 5
-          }
-        ]
-        
+"""
+    )
+    PROMPT_TAIL = (
+        """
         ## Output
         
         1. **Performance Feedback:**
@@ -418,9 +312,220 @@ if __name__ == "__main__":
         """
     )
 
+    # Example history: every session of the user, oldest first
+    HISTORY_PERFORMANCE = [
+        {
+            "session": "s_001",
+            "date": "01/01/2025",
+            "performance": [
+                {
+                    "repetition": 0,
+                    "state": "CORRECT",
+                    "feedback": []
+                },
+                {
+                    "repetition": 1,
+                    "state": "CORRECT",
+                    "feedback": []
+                },
+                {
+                    "repetition": 2,
+                    "state": "CORRECT",
+                    "feedback": []
+                },
+                {
+                    "repetition": 3,
+                    "state": "FAILED",
+                    "feedback": [
+                        "Your back is not forward enough"
+                    ]
+                },
+                {
+                    "repetition": 4,
+                    "state": "CORRECT",
+                    "feedback": []
+                },
+                {
+                    "repetition": 5,
+                    "state": "IMPROPER",
+                    "feedback": [
+                        "Your back is leaning too forward"
+                    ]
+                },
+                {
+                    "repetition": 6,
+                    "state": "IMPROPER",
+                    "feedback": [
+                        "Your thighs drop too below your knees",
+                        "Your back is not forward enough"
+                    ]
+                },
+                {
+                    "repetition": 7,
+                    "state": "FAILED",
+                    "feedback": [
+                        "Your knees are too low, making them closer to your toes",
+                        "Your back is not forward enough"
+                    ]
+                }
+            ]
+        },
+        {
+            "session": "s_002",
+            "date": "03/01/2025",
+            "performance": [
+                {
+                    "repetition": 0,
+                    "state": "CORRECT",
+                    "feedback": []
+                },
+                {
+                    "repetition": 1,
+                    "state": "CORRECT",
+                    "feedback": []
+                },
+                {
+                    "repetition": 2,
+                    "state": "CORRECT",
+                    "feedback": []
+                },
+                {
+                    "repetition": 3,
+                    "state": "FAILED",
+                    "feedback": [
+                        "Your back is not forward enough"
+                    ]
+                },
+                {
+                    "repetition": 4,
+                    "state": "CORRECT",
+                    "feedback": []
+                },
+                {
+                    "repetition": 5,
+                    "state": "IMPROPER",
+                    "feedback": [
+                        "Your back is leaning too forward"
+                    ]
+                },
+                {
+                    "repetition": 6,
+                    "state": "IMPROPER",
+                    "feedback": [
+                        "Your thighs drop too below your knees",
+                        "Your back is not forward enough"
+                    ]
+                },
+                {
+                    "repetition": 7,
+                    "state": "FAILED",
+                    "feedback": [
+                        "Your knees are too low, making them closer to your toes",
+                        "Your back is not forward enough"
+                    ]
+                }
+            ]
+        },
+        {
+            "session": "s_003",
+            "date": "06/01/2025",
+            "performance": [
+                {
+                    "repetition": 0,
+                    "state": "CORRECT",
+                    "feedback": []
+                },
+                {
+                    "repetition": 1,
+                    "state": "CORRECT",
+                    "feedback": []
+                },
+                {
+                    "repetition": 2,
+                    "state": "CORRECT",
+                    "feedback": []
+                },
+                {
+                    "repetition": 3,
+                    "state": "CORRECT",
+                    "feedback": []
+                },
+                {
+                    "repetition": 4,
+                    "state": "CORRECT",
+                    "feedback": []
+                },
+                {
+                    "repetition": 5,
+                    "state": "CORRECT",
+                    "feedback": []
+                },
+                {
+                    "repetition": 6,
+                    "state": "CORRECT",
+                    "feedback": []
+                },
+                {
+                    "repetition": 7,
+                    "state": "CORRECT",
+                    "feedback": []
+                },
+                {
+                    "repetition": 8,
+                    "state": "CORRECT",
+                    "feedback": []
+                },
+                {
+                    "repetition": 9,
+                    "state": "CORRECT",
+                    "feedback": []
+                }
+            ]
+        }
+    ]
+    FEEDBACK_USER = [
+        {
+            "session": "s_001",
+            "date": "01/01/2025",
+            "motivation": [
+                "You are doing great, Miyu_9! Remember your main objective of losing weight. Keep pushing yourself and you'll reach your goal in no time!",
+                "Great job on maintaining a consistent training schedule and variety in your workouts. This will help you achieve your fitness goals."
+            ],
+            "motivation_score": 4
+        },
+        {
+            "session": "s_002",
+            "date": "03/01/2025",
+            "motivation": [
+                "You're doing great on your weight loss journey! Remembering that every small step counts towards your goal of losing more weight is inspiring.",
+                "Keep pushing yourself and staying committed to your workout routine."
+            ],
+            "motivation_score": 2
+        },
+        {
+            "session": "s_003",
+            "date": "06/01/2025",
+            "motivation": [
+                "Your goal to lose weight is inspiring! Remember, every small step counts toward achieving your long-term objective. Your progress so far is very good, and you should be proud of yourself for sticking to your exercise routine.",
+                "You've shown that you can achieve significant weight loss with consistent training. Keep up the great work!",
+                "Your ability to choose cardio exercises aligns with your preferences, which is excellent for maintaining motivation. You're on the right track!"
+            ],
+            "motivation_score": 5
+        }
+    ]
+
+    # the last HISTORY_KEEP_LAST sessions go in full, older ones only as a summary
+    PROMPT_TEMPLATE = PROMPT_HEAD + textwrap.indent(history_section(HISTORY_PERFORMANCE, FEEDBACK_USER), " " * 8) \
+        + PROMPT_TAIL
+
     # Example JSON input
 
 
-    # Run the model
-    response = run_ollama(PROMPT_TEMPLATE)
-    print(response)
+    # Run the model, streaming tokens to the terminal as they arrive
+    if "--subprocess" in sys.argv:
+        print(run_ollama(PROMPT_TEMPLATE, backend="subprocess"))
+    else:
+        timings = {}
+        run_ollama(PROMPT_TEMPLATE, on_token=lambda token: print(token, end="", flush=True), timings=timings)
+        print()
+        print(f"time to first token: {timings['ttft']:.2f}s, total: {timings['total']:.2f}s", file=sys.stderr)
@@ -1,42 +1,8 @@
-import json
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
 from langchain.llms import Ollama
 
-
-# Prompt Template
-def build_prompt(input_json):
-    template = (
-        "You are an AI Assistant specialized in exercise coaching and motivation. "
-        "Your task is to provide feedback and personalized motivational messages based on the user's performance analysis and their personal details. "
-        "Consider the user's goals, preferences, and history to make the feedback effective and tailored to their needs. "
-        "Use the data provided in the JSON format below:\n\n"
-        "{input_json}\n\n"
-        "### Instructions:\n"
-        "1. Performance Feedback:\n"
-        "   Analyze the 'Squat Performance Analysis' data and identify issues with the user's squat performance. Provide constructive feedback to improve their form or execution.\n"
-        "2. Personalized Motivation:\n"
-        "   Use the user's 'User Personalization' data to craft motivational messages.\n"
-        "   - Reference their main exercise objectives to remind them of their long-term goals.\n"
-        "   - Incorporate their exercise preferences to align motivation with what they enjoy.\n"
-        "   - Acknowledge their greatest achievement to build confidence.\n"
-        "3. Tone and Style:\n"
-        "   - Keep your tone positive, empathetic, and encouraging.\n"
-        "   - Use simple language, avoiding overly technical terms unless necessary.\n"
-        "4. Health Considerations:\n"
-        "   Respect the user's medical history and suggest modifications if needed, ensuring the exercise is safe and sustainable.\n\n"
-        "### Expected Output Format:\n"
-        "#### Feedback Section:\n"
-        "Provide detailed feedback for each failed repetition in the 'Squat Performance Analysis'. Example:\n"
-        "- Repetition 0: [Feedback about the issue and how to fix it.]\n"
-        "#### Motivation Section:\n"
-        "Craft motivational messages based on their personal data. Example:\n"
-        "- 'Your goal to improve cardiovascular fitness and mental health is inspiring! Remember, every small effort counts toward this long-term journey.'\n"
-        "#### Safety Note Section:\n"
-        "Provide a safety or health-related recommendation based on the 'Medical History and Physical Condition' data. Example:\n"
-        "- 'Since you have a history of major injuries and respiratory issues, consult with a medical professional before attempting advanced movements.'"
-    )
-    return template.format(input_json=json.dumps(input_json, indent=4))
+from prompts import build_prompt
 
 
 # Main Execution
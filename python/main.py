@@ -1,41 +1,56 @@
-import json
-import requests
+from context_store import ContextStore
+from ollama_client import get_client
+from prompt_cache import cache_key
 
 # NOTE: ollama must be running for this to work, start the ollama app or run `ollama serve`
 model = 'llama3.1'  # TODO: update this for whatever model you wish to use
 
+# ContextStore prefix under which the context of a user's running conversation is kept
+CONVERSATION = 'conversation'
 
-def generate(prompt, context):
-    r = requests.post('http://localhost:11434/api/generate',
-                      json={
-                          'model': model,
-                          'prompt': prompt,
-                          'context': context,
-                      },
-                      stream=True)
-    r.raise_for_status()
 
-    for line in r.iter_lines():
-        body = json.loads(line)
+def generate(prompt, context=None, client=None, cache=None, store=None, user_id=None):
+    """
+    Stream `prompt` to the model, continuing `context`, and return the new context.
+
+    With a `ContextStore`, `context` defaults to the one stored for `user_id` and the returned
+    context is stored again, so follow-up calls continue the conversation without resending it.
+    """
+    if context is None:
+        context = (store.get(user_id, model, CONVERSATION) if store is not None else None) or []
+    if cache is not None:
+        key = cache_key(model, prompt, context=context)
+        cached = cache.get(key)
+        if cached is not None:
+            print(cached['response'], end='', flush=True)
+            if store is not None:
+                store.put(user_id, model, CONVERSATION, cached['context'])
+            return cached['context']
+
+    client = client or get_client()
+    parts = []
+    for body in client.stream_generate(model, prompt, context=context):
         response_part = body.get('response', '')
         # the response streams one token at a time, print that as we receive it
         print(response_part, end='', flush=True)
-
-        if 'error' in body:
-            raise Exception(body['error'])
+        parts.append(response_part)
 
         if body.get('done', False):
+            if cache is not None:
+                cache.set(key, {'response': ''.join(parts), 'context': body['context']})
+            if store is not None:
+                store.put(user_id, model, CONVERSATION, body['context'])
             return body['context']
 
 
 def main():
-    # context = []  # the context stores a conversation history, you can use this to make the model more context aware
+    # store = ContextStore()  # the context stores a conversation history, you can use this to make the model more context aware
     # while True:
     #     user_input = input("Enter a prompt: ")
     #     if not user_input:
     #         exit()
     #     print()
-    #     context = generate(user_input, context)
+    #     generate(user_input, store=store, user_id='local')
     #     print()
     JSON_INPUT = {
         "User Personalization": {
@@ -0,0 +1,173 @@
+import threading
+import time
+
+from ollama_client import get_client
+from prompt_encoding import estimate_tokens
+from rule_feedback import faulty_reps
+
+FAST_MODEL = "llama3.1"
+REASONING_MODEL = "deepseek-r1"
+
+# Points per feature; a case scoring at least THRESHOLD goes to the reasoning model
+WEIGHTS = {
+    "faulty_reps": 1.0,
+    "medical_flags": 1.0,
+    "history_sessions": 0.5,
+}
+THRESHOLD = 4.0
+
+# Answers that do not raise a medical flag
+_HEALTHY_ANSWERS = {"", "no", "none", "n/a", "not sure"}
+_MEDICAL_WORDS = ("injury", "medication", "cardiovascular", "respiratory", "health condition", "pain")
+_HISTORY_KEYS = ("History Performance", "feedback_history", "Feedback User", "History of Squat Training Session")
+
+
+def _find(data, key):
+    """First value stored under `key` anywhere in nested dicts, or None."""
+    if isinstance(data, dict):
+        if key in data:
+            return data[key]
+        for value in data.values():
+            found = _find(value, key)
+            if found is not None:
+                return found
+    return None
+
+
+def _is_flag(answer):
+    if isinstance(answer, list):
+        return any(_is_flag(item) for item in answer)
+    return str(answer).strip().lower() not in _HEALTHY_ANSWERS
+
+
+def medical_flags(case):
+    """
+    Number of medical answers that are not a plain "no".
+
+    Understands the "Medical History and Physical Condition" section of the generated cases
+    as well as the question/answer list of llm-deep.py.
+    """
+    section = _find(case, "Medical History and Physical Condition")
+    if isinstance(section, dict):
+        return sum(_is_flag(answer) for answer in section.values())
+    answers = _find(case, "User Personalization")
+    if isinstance(answers, list):
+        return sum(_is_flag(item.get("answer")) for item in answers
+                   if isinstance(item, dict) and any(word in item.get("question", "").lower()
+                                                     for word in _MEDICAL_WORDS))
+    return 0
+
+
+def case_features(case):
+    """
+    Returns:
+        dict: `faulty_reps`, `medical_flags` and `history_sessions` of one case.
+    """
+    analysis = _find(case, "Squat Performance Analysis") or []
+    history = max((len(value) for value in (_find(case, key) for key in _HISTORY_KEYS)
+                   if isinstance(value, list)), default=0)
+    return {
+        "faulty_reps": len(faulty_reps(analysis)),
+        "medical_flags": medical_flags(case),
+        "history_sessions": history,
+    }
+
+
+def complexity_score(case, weights=WEIGHTS):
+    features = case_features(case)
+    return sum(weights.get(name, 0.0) * value for name, value in features.items())
+
+
+class RouteStats:
+    def __init__(self, model, cost_per_1k_tokens=0.0):
+        self.model = model
+        self.cost_per_1k_tokens = cost_per_1k_tokens
+        self.requests = 0
+        self.errors = 0
+        self.latency = 0.0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+
+    @property
+    def cost(self):
+        return (self.prompt_tokens + self.output_tokens) / 1000 * self.cost_per_1k_tokens
+
+    def to_dict(self):
+        return {
+            "model": self.model,
+            "requests": self.requests,
+            "errors": self.errors,
+            "mean_latency": self.latency / self.requests if self.requests else 0.0,
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "cost": round(self.cost, 6),
+        }
+
+
+class ModelRouter:
+    """
+    Sends simple cases to a small fast model and complex ones to the reasoning model.
+
+    With the default weights a case without faulty reps and history, e.g. the all-CORRECT
+    cases the generators emit for `case_id % 7 in (0, 1)`, scores at most its three medical
+    flags and always takes the fast route.
+
+    Parameters:
+        fast_model (str): Model for cases scoring below `threshold`.
+        reasoning_model (str): Model for the others.
+        threshold (float): Score from which a case is routed to the reasoning model.
+        weights (dict): Points per feature of `case_features`.
+        costs (dict): Price per 1000 tokens of each route, `{"fast": ..., "reasoning": ...}`.
+    """
+
+    def __init__(self, fast_model=FAST_MODEL, reasoning_model=REASONING_MODEL, threshold=THRESHOLD,
+                 weights=WEIGHTS, costs=None):
+        costs = costs or {}
+        self.threshold = threshold
+        self.weights = weights
+        self.routes = {
+            "fast": RouteStats(fast_model, costs.get("fast", 0.0)),
+            "reasoning": RouteStats(reasoning_model, costs.get("reasoning", 0.0)),
+        }
+        self._lock = threading.Lock()
+
+    def route(self, case):
+        """
+        Returns:
+            tuple: (route name, model name) for `case`.
+        """
+        name = "reasoning" if complexity_score(case, self.weights) >= self.threshold else "fast"
+        return name, self.routes[name].model
+
+    def record(self, route, latency, prompt_tokens=0, output_tokens=0, error=False):
+        with self._lock:
+            stats = self.routes[route]
+            stats.requests += 1
+            stats.errors += bool(error)
+            stats.latency += latency
+            stats.prompt_tokens += prompt_tokens or 0
+            stats.output_tokens += output_tokens or 0
+
+    def generate(self, case, prompt, client=None, options=None):
+        """
+        Run `prompt` on the model chosen for `case`.
+
+        Returns:
+            dict: The final chunk of the generation with the full `response`, plus the `route` taken.
+        """
+        client = client or get_client()
+        route, model = self.route(case)
+        start = time.perf_counter()
+        try:
+            body = client.generate(model, prompt, options=options)
+        except Exception:
+            self.record(route, time.perf_counter() - start, error=True)
+            raise
+        self.record(route, time.perf_counter() - start,
+                    body.get("prompt_eval_count") or estimate_tokens(prompt),
+                    body.get("eval_count") or estimate_tokens(body["response"]))
+        return {**body, "route": route}
+
+    def stats(self):
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in self.routes.items()}
@@ -0,0 +1,213 @@
+import asyncio
+import json
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import instrumentation
+
+try:
+    import httpx
+except ImportError:  # the async client is optional, the sync one only needs requests
+    httpx = None
+
+# NOTE: ollama must be running for this to work, start the ollama app or run `ollama serve`
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+DEFAULT_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "8"))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "4"))
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 300.0
+
+
+class OllamaError(Exception):
+    pass
+
+
+def _base_url(host):
+    host = host or OLLAMA_HOST
+    if not host.startswith(("http://", "https://")):
+        host = f"http://{host}"
+    return host.rstrip("/")
+
+
+def _build_payload(model, prompt, context=None, options=None, keep_alive=None, stream=True, **extra):
+    payload = {"model": model, "prompt": prompt, "stream": stream}
+    if context:
+        payload["context"] = context
+    if options:
+        payload["options"] = options
+    if keep_alive is not None:
+        payload["keep_alive"] = keep_alive
+    payload.update(extra)
+    return payload
+
+
+def _parse_line(line):
+    if not line:
+        return None
+    body = json.loads(line)
+    if "error" in body:
+        raise OllamaError(body["error"])
+    return body
+
+
+class OllamaClient:
+    """
+    Blocking Ollama client backed by a pooled `requests.Session`.
+
+    One instance is safe to share between threads: connections are kept alive in the
+    session's pool and at most `max_concurrency` generations are in flight at once.
+
+    Parameters:
+        host (str): Base URL of the Ollama server, defaults to $OLLAMA_HOST.
+        max_connections (int): Size of the keep-alive connection pool.
+        max_concurrency (int): Number of generations allowed to run at the same time.
+        timeout (tuple): (connect, read) timeout in seconds passed to every request.
+    """
+
+    def __init__(self, host=None, max_connections=DEFAULT_MAX_CONNECTIONS,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 timeout=(DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT)):
+        self.base_url = _base_url(host)
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def stream_generate(self, model, prompt, context=None, options=None, keep_alive=None, **extra):
+        """
+        Stream `/api/generate` and yield every decoded chunk as it arrives.
+
+        The last chunk has `done` set and carries the `context` of the conversation.
+        """
+        payload = _build_payload(model, prompt, context, options, keep_alive, stream=True, **extra)
+        with self._slots:
+            timer = instrumentation.stream_timer(model=model)
+            with self.session.post(f"{self.base_url}/api/generate", json=payload,
+                                   stream=True, timeout=self.timeout) as r:
+                r.raise_for_status()
+                if timer:
+                    timer.sent()
+                lines = r.iter_lines()
+                for line in lines:
+                    body = _parse_line(line)
+                    if body is None:
+                        continue
+                    if timer and body.get("response"):
+                        timer.token()
+                    if body.get("done", False):
+                        # finish reading the stream so the connection goes back to the pool
+                        for _ in lines:
+                            pass
+                        if timer:
+                            timer.done()
+                        yield body
+                        return
+                    yield body
+
+    def generate(self, model, prompt, context=None, options=None, keep_alive=None, **extra):
+        """
+        Run a generation to completion.
+
+        Returns:
+            dict: The final chunk with `response` replaced by the full concatenated text.
+        """
+        parts = []
+        body = {}
+        for body in self.stream_generate(model, prompt, context, options, keep_alive, **extra):
+            parts.append(body.get("response", ""))
+        return {**body, "response": "".join(parts)}
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncOllamaClient:
+    """
+    asyncio counterpart of `OllamaClient` built on `httpx.AsyncClient`.
+
+    Parameters are the same as `OllamaClient`; the semaphore is created lazily so the
+    client can be constructed outside of a running event loop.
+    """
+
+    def __init__(self, host=None, max_connections=DEFAULT_MAX_CONNECTIONS,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 timeout=(DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT)):
+        if httpx is None:
+            raise ImportError("AsyncOllamaClient requires httpx, install it with `pip install httpx`")
+        connect, read = timeout
+        self.base_url = _base_url(host)
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(read, connect=connect),
+        )
+        self.max_concurrency = max_concurrency
+        self._slots = None
+
+    async def stream_generate(self, model, prompt, context=None, options=None, keep_alive=None, **extra):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        payload = _build_payload(model, prompt, context, options, keep_alive, stream=True, **extra)
+        async with self._slots:
+            timer = instrumentation.stream_timer(model=model)
+            async with self.client.stream("POST", "/api/generate", json=payload) as r:
+                r.raise_for_status()
+                if timer:
+                    timer.sent()
+                lines = r.aiter_lines()
+                async for line in lines:
+                    body = _parse_line(line)
+                    if body is None:
+                        continue
+                    if timer and body.get("response"):
+                        timer.token()
+                    if body.get("done", False):
+                        async for _ in lines:
+                            pass
+                        if timer:
+                            timer.done()
+                        yield body
+                        return
+                    yield body
+
+    async def generate(self, model, prompt, context=None, options=None, keep_alive=None, **extra):
+        parts = []
+        body = {}
+        async for body in self.stream_generate(model, prompt, context, options, keep_alive, **extra):
+            parts.append(body.get("response", ""))
+        return {**body, "response": "".join(parts)}
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide `OllamaClient` shared by the scripts in this folder."""
+    global _default_client
+    if _default_client is None:
+        with _default_lock:
+            if _default_client is None:
+                _default_client = OllamaClient()
+    return _default_client
@@ -0,0 +1,181 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for `ollama serve` (and the OpenAI-compatible chat API), used to exercise the
+# clients without a GPU or a model. Delays are in seconds: token_delay=0.02 streams 50 tokens/s.
+DEFAULT_RESPONSE = json.dumps({
+    "performance_feedback": [
+        {"rep": 0, "state": "IMPROPER", "details": "Keep your knees behind your toes"}
+    ],
+    "motivation": [
+        "Great work today, every rep brings you closer to your goal.",
+        "Stay consistent and the progress will follow."
+    ],
+    "safety": "Stop if you feel chest pain or shortness of breath."
+})
+
+
+def tokenize(text):
+    """Split text into pseudo tokens of roughly four characters, like a real tokenizer would."""
+    return [text[i:i + 4] for i in range(0, len(text), 4)] or [""]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _write_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _send_json(self, body, status=200):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": name} for name in self.server.models]})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        if self.path == "/v1/chat/completions":
+            self._chat_completions()
+            return
+        if self.path != "/api/generate":
+            self._send_json({"error": "not found"}, status=404)
+            return
+        body = self._read_json()
+        server = self.server
+        with server.lock:
+            server.requests.append(body)
+
+        text = server.response_for(body)
+        context = list(body.get("context") or []) + list(range(len(tokenize(body.get("prompt", "")))))
+        time.sleep(server.first_token_delay)
+
+        if not body.get("stream", True):
+            time.sleep(server.token_delay * len(tokenize(text)))
+            self._send_json({"model": body.get("model"), "response": text, "done": True, "context": context})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for token in tokenize(text):
+                self._write_chunk((json.dumps({"model": body.get("model"), "response": token, "done": False})
+                                   + "\n").encode())
+                time.sleep(server.token_delay)
+            self._write_chunk((json.dumps({"model": body.get("model"), "response": "", "done": True,
+                                           "context": context}) + "\n").encode())
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # the client cancelled the generation, like Ollama we just stop
+            with server.lock:
+                server.cancelled += 1
+            self.close_connection = True
+
+    def _chat_completions(self):
+        # OpenAI-compatible endpoint (DeepSeek API shape): reasoning_content first, then content
+        body = self._read_json()
+        server = self.server
+        with server.lock:
+            server.requests.append(body)
+
+        text = server.response_for(body)
+        reasoning = server.reasoning
+        time.sleep(server.first_token_delay)
+        base = {"id": f"stub-{len(server.requests)}", "object": "chat.completion", "model": body.get("model")}
+
+        if not body.get("stream"):
+            time.sleep(server.token_delay * (len(tokenize(text)) + len(tokenize(reasoning))))
+            message = {"role": "assistant", "content": text, "reasoning_content": reasoning}
+            self._send_json({**base, "choices": [{"index": 0, "message": message, "finish_reason": "stop"}]})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        deltas = [{"reasoning_content": token} for token in tokenize(reasoning) if token]
+        deltas += [{"content": token} for token in tokenize(text)]
+        try:
+            for delta in deltas:
+                chunk = {**base, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+                time.sleep(server.token_delay)
+            final = {**base, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            self._write_chunk(f"data: {json.dumps(final)}\n\n".encode())
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            with server.lock:
+                server.cancelled += 1
+            self.close_connection = True
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, response=DEFAULT_RESPONSE, first_token_delay=0.0, token_delay=0.0,
+                 models=("llama3.1", "deepseek-r1"), reasoning=""):
+        super().__init__(address, StubHandler)
+        self.response = response
+        self.reasoning = reasoning
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.models = list(models)
+        self.requests = []
+        self.cancelled = 0
+        self.lock = threading.Lock()
+
+    def response_for(self, body):
+        return self.response(body) if callable(self.response) else self.response
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_stub_server(host="127.0.0.1", port=0, **kwargs):
+    """
+    Start a stub server on a background thread.
+
+    Returns:
+        StubServer: The running server; `server.url` is its base URL and `server.shutdown()` stops it.
+    """
+    server = StubServer((host, port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Ollama server for local testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--first-token-delay", type=float, default=0.0)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubServer((args.host, args.port), first_token_delay=args.first_token_delay,
+                        token_delay=args.token_delay)
+    print(f"Stub Ollama listening on {server.url}")
+    server.serve_forever()
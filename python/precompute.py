@@ -0,0 +1,234 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from ollama_client import get_client
+from prompt_cache import PromptCache, canonical_json
+from prompts import build_prompt
+from scheduler import INTERACTIVE, SPECULATIVE, Overloaded, get_scheduler
+from single_flight import SingleFlight
+from user_aggregates import submit_session
+
+DEFAULT_MODEL = "llama3.1"
+# Inputs of shed speculations kept for the request that follows
+MAX_SHED_INPUTS = 1024
+
+
+def feedback_key(exercise_id, feedback_type="performance"):
+    return f"feedback:{feedback_type}:{exercise_id}"
+
+
+def feedback_input(personalization, analysis):
+    """The `build_prompt` input for one stored session."""
+    return {"User Personalization": personalization, "Squat Performance Analysis": analysis}
+
+
+def input_digest(data):
+    """Hash of a feedback input, stored with the response so a changed input is not served old feedback."""
+    return hashlib.sha256(canonical_json(data).encode("utf-8")).hexdigest()
+
+
+class _Pending:
+    __slots__ = ("future", "ticket", "data", "digest", "flight")
+
+    def __init__(self, ticket, data, key):
+        self.future = Future()
+        self.ticket = ticket
+        self.data = data
+        self.digest = input_digest(data)
+        self.flight = f"{key}:{self.digest}"
+
+
+class FeedbackPrecomputer:
+    """
+    Starts the feedback generation of an exercise as soon as its squat analysis is stored,
+    so the `llm-feedback` request that follows finds it running or finished.
+
+    Speculative generations run at `SPECULATIVE` priority: ahead of batch work, behind requests
+    a user is waiting on, and shed first when the scheduler is overloaded. A request for an
+    exercise that was speculated promotes the generation to `INTERACTIVE` if it is still queued
+    and attaches to it (replaying the tokens streamed so far), or reads the finished response
+    from `cache`; anything else, including shed speculations, is generated on demand at
+    `INTERACTIVE` priority.
+
+    Responses are cached by exerciseId together with the digest of their input: speculating
+    again with a different input (a corrected analysis) replaces the running or cached
+    generation, and a request that passes `data` is never served feedback for another input.
+
+    Parameters:
+        client: `OllamaClient` or a wrapper such as `CoalescingClient`.
+        cache (PromptCache): Finished responses, keyed by exerciseId.
+        scheduler (Scheduler): Admission control for the generations.
+        model (str): The name of the model to use.
+        options (dict): Generation options.
+        build (callable): Builds the prompt from the feedback input, defaults to `build_prompt`.
+    """
+
+    def __init__(self, client=None, cache=None, scheduler=None, model=DEFAULT_MODEL, options=None,
+                 build=build_prompt):
+        self.client = client or get_client()
+        self.cache = cache if cache is not None else PromptCache()
+        self.scheduler = scheduler or get_scheduler()
+        self.model = model
+        self.options = options
+        self.build = build
+        self.flights = SingleFlight()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._shed = OrderedDict()
+        self.counts = {"speculated": 0, "cached": 0, "attached": 0, "on_demand": 0, "failed": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def speculate(self, exercise_id, data, feedback_type="performance", priority=SPECULATIVE):
+        """
+        Start generating the feedback of `exercise_id` in the background, unless it is already
+        running or cached.
+
+        Parameters:
+            exercise_id (str): Id the frontend will request the feedback with.
+            data (dict): The `build` input, see `feedback_input`.
+            feedback_type (str): The `type` of the request, part of the key.
+            priority (int): Scheduler priority of the generation.
+
+        Returns:
+            Future: Resolves to the cached value, `{"response", "model"}`.
+        """
+        return self._start(feedback_key(exercise_id, feedback_type), data, priority).future
+
+    def _start(self, key, data, priority):
+        digest = input_digest(data)
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None and pending.digest == digest:
+                return pending
+            # a generation for an older input keeps running for its own waiters, but is not cached
+            pending = self._pending[key] = _Pending(self.scheduler.ticket(priority), data, key)
+        cached = self.cache.get(key)
+        if cached is not None and cached.get("input") == digest:
+            self._settle(key, pending, cached)
+            return pending
+
+        prompt = self.build(data)
+
+        def start():
+            with self.scheduler.slot(ticket=pending.ticket):
+                yield from self.client.stream_generate(self.model, prompt, options=self.options)
+
+        stream = self.flights.stream(pending.flight, start)
+        if priority == SPECULATIVE:
+            self._count("speculated")
+        threading.Thread(target=self._collect, args=(key, stream, pending), daemon=True).start()
+        return pending
+
+    def _collect(self, key, stream, pending):
+        parts = []
+        try:
+            for body in stream:
+                parts.append(body.get("response", ""))
+        except Exception as e:
+            self._count("failed")
+            with self._lock:
+                if self._pending.get(key) is pending:
+                    del self._pending[key]
+                if isinstance(e, Overloaded):
+                    self._shed[key] = pending.data
+                    while len(self._shed) > MAX_SHED_INPUTS:
+                        self._shed.popitem(last=False)
+            pending.future.set_exception(e)
+            return
+        value = {"response": "".join(parts), "model": self.model, "input": pending.digest}
+        with self._lock:
+            # cached before the pending entry goes, so a lookup always finds one of the two
+            if self._pending.get(key) is pending:
+                self.cache.set(key, value)
+        self._settle(key, pending, value)
+
+    def _settle(self, key, pending, value):
+        pending.future.set_result(value)
+        with self._lock:
+            if self._pending.get(key) is pending:
+                del self._pending[key]
+
+    def feedback(self, exercise_id, data=None, feedback_type="performance", on_token=None,
+                 timeout=None):
+        """
+        The feedback of `exercise_id`: attached to the speculative generation if it is still
+        running, from the cache if it finished, otherwise generated now at `INTERACTIVE` priority.
+
+        Parameters:
+            exercise_id (str): The `exerciseId` of the request.
+            data (dict): Needed only when nothing was speculated for `exercise_id`; a shed
+                speculation is regenerated from its own input. If given, feedback generated
+                from any other input is regenerated.
+            feedback_type (str): The `type` of the request.
+            on_token (callable): Called with every response fragment, replaying those streamed
+                before the request arrived.
+            timeout (float): Seconds to wait for the generation.
+
+        Returns:
+            dict: `{"response", "model"}`.
+        """
+        key = feedback_key(exercise_id, feedback_type)
+        with self._lock:
+            pending = self._pending.get(key)
+            shed = self._shed.pop(key, None)
+        digest = input_digest(data) if data is not None else None
+        data = data if data is not None else shed
+        if pending is not None and digest is not None and pending.digest != digest:
+            pending = None
+        if pending is None:
+            cached = self.cache.get(key)
+            if cached is not None and (digest is None or cached.get("input") == digest):
+                self._count("cached")
+                if on_token:
+                    on_token(cached["response"])
+                return cached
+            if data is None:
+                raise KeyError(f"no feedback for exercise {exercise_id!r} and no input to generate it")
+            self._count("on_demand")
+            pending = self._start(key, data, INTERACTIVE)
+        else:
+            self._count("attached")
+            # the user now waits on it, it must not stay behind other speculations
+            self.scheduler.promote(pending.ticket, INTERACTIVE)
+
+        try:
+            return self._wait(key, pending, on_token, timeout)
+        except Overloaded:
+            # shed before it got a slot, nothing was streamed yet
+            pending.future.exception()
+            self._count("on_demand")
+            return self._wait(key, self._start(key, pending.data, INTERACTIVE), on_token, timeout)
+
+    def _wait(self, key, pending, on_token, timeout):
+        if on_token:
+            stream = self.flights.join(pending.flight)
+            if stream is not None:
+                for body in stream:
+                    on_token(body.get("response", ""))
+                return pending.future.result(timeout)
+            on_token(pending.future.result(timeout)["response"])
+        return pending.future.result(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {**self.counts, "pending": len(self._pending), "shed": len(self._shed)}
+
+
+def store_analysis(store, precomputer, user_id, exercise_id, session, day, performance):
+    """
+    Store a finished session (see `user_aggregates.submit_session`) and start its feedback;
+    a resubmitted session replaces the feedback of its earlier analysis.
+
+    Returns:
+        UserAggregate: The updated aggregate.
+    """
+    aggregate = submit_session(store, user_id, session, day, performance)
+    personalization = store.get_user(user_id)
+    if personalization is not None:
+        precomputer.speculate(exercise_id, feedback_input(personalization, performance))
+    return aggregate
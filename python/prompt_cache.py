@@ -0,0 +1,154 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def canonical_json(data):
+    """Serialize `data` so that equal inputs always give the same string, regardless of key order."""
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def cache_key(model, prompt, options=None, context=None):
+    """
+    Content-addressed key for one generation request.
+
+    `prompt` may be the formatted prompt string or the input JSON passed to `build_prompt`;
+    dicts are canonicalized first so reordered keys hit the same entry.
+    """
+    if not isinstance(prompt, str):
+        prompt = canonical_json(prompt)
+    material = canonical_json({"model": model, "options": options or {}, "prompt": prompt,
+                               "context": context or []})
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class PromptCache:
+    """
+    Two-tier response cache: an in-memory LRU in front of an optional SQLite file.
+
+    Parameters:
+        path (str): SQLite database file for the on-disk tier, None keeps the cache in memory only.
+        max_entries (int): Capacity of the in-memory LRU.
+        max_disk_entries (int): Capacity of the on-disk tier; once it is exceeded the oldest entries
+            are evicted, plus 1% of the capacity so the next evictions come in batches.
+        ttl (float): Seconds an entry stays valid, None never expires.
+    """
+
+    def __init__(self, path=None, max_entries=1024, max_disk_entries=100_000, ttl=24 * 3600):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._disk_count = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+            self._db.commit()
+            # counted once here and then kept up to date, set() must not scan the table
+            self._disk_count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def _remember(self, key, value, created):
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created = entry
+                if not self._expired(created, now):
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if not self._expired(row[1], now):
+                        value = json.loads(row[0])
+                        self._remember(key, value, row[1])
+                        self.stats["disk_hits"] += 1
+                        return value
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                    self._disk_count -= 1
+
+            self.stats["misses"] += 1
+            return default
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            if self._db is not None:
+                exists = self._db.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone()
+                self._db.execute("INSERT OR REPLACE INTO responses (key, value, created) VALUES (?, ?, ?)",
+                                 (key, json.dumps(value, ensure_ascii=False), now))
+                if exists is None:
+                    self._disk_count += 1
+                if self._disk_count > self.max_disk_entries:
+                    # evict a batch at once, so the oldest-first delete runs once per batch and not per set()
+                    excess = self._disk_count - self.max_disk_entries + self.max_disk_entries // 100
+                    evicted = self._db.execute(
+                        "DELETE FROM responses WHERE key IN "
+                        "(SELECT key FROM responses ORDER BY created LIMIT ?)", (excess,)).rowcount
+                    self._disk_count -= evicted
+                    self.stats["evictions"] += evicted
+                self._db.commit()
+
+    def get_or_generate(self, model, prompt, generate, options=None):
+        """
+        Return the cached value for this request, or call `generate()` and cache its result.
+
+        Parameters:
+            model (str): The name of the model, part of the key.
+            prompt (str | dict): Formatted prompt or prompt input JSON, part of the key.
+            generate (callable): Zero-argument function producing a JSON-serializable value.
+            options (dict): Generation options, part of the key.
+        """
+        key = cache_key(model, prompt, options)
+        value = self.get(key)
+        if value is None:
+            value = generate()
+            self.set(key, value)
+        return value
+
+    def prune(self):
+        """Drop every expired entry from both tiers."""
+        if self.ttl is None:
+            return
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for key in [k for k, (_, created) in self._memory.items() if created < cutoff]:
+                del self._memory[key]
+            if self._db is not None:
+                self._disk_count -= self._db.execute("DELETE FROM responses WHERE created < ?", (cutoff,)).rowcount
+                self._db.commit()
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
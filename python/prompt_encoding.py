@@ -0,0 +1,184 @@
+import argparse
+import json
+import re
+
+FORMATS = ("pretty", "minified", "abbreviated", "tabular")
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]|\s*\n\s*|\s{2,}")
+
+
+def estimate_tokens(text):
+    """
+    Rough BPE token count: punctuation marks and runs of indentation are one token each and
+    words cost one token per four characters. Close enough to compare encodings when no real
+    tokenizer is at hand.
+    """
+    return sum((len(piece) + 3) // 4 if piece[0].isalnum() or piece[0] == "_" else 1
+               for piece in _TOKEN_PATTERN.findall(text))
+
+
+def omit_empty(data):
+    """Recursively drop keys whose value is an empty list, dict, string or None."""
+    if isinstance(data, dict):
+        cleaned = {key: omit_empty(value) for key, value in data.items()}
+        return {key: value for key, value in cleaned.items() if value not in ([], {}, "", None)}
+    if isinstance(data, list):
+        return [omit_empty(item) for item in data]
+    return data
+
+
+def _collect_keys(data, keys):
+    if isinstance(data, dict):
+        for key, value in data.items():
+            keys[key] = keys.get(key, 0) + 1
+            _collect_keys(value, keys)
+    elif isinstance(data, list):
+        for item in data:
+            _collect_keys(item, keys)
+    return keys
+
+
+def abbreviations(data, min_count=3):
+    """
+    Map repeated keys of `data` to their initials, e.g. "Squat Performance Analysis" -> "SPA"
+    and "repetition" -> "rep". Keys seen fewer than `min_count` times are kept as they are,
+    their legend entry would cost more than the abbreviation saves. An abbreviation never equals
+    another key of `data`:
+
+    >>> abbreviations({"rest": [{"repetition": 2, "rep": 0}] * 3})
+    {'rest': 'rest', 'repetition': 'rep2', 'rep': 'rep'}
+    """
+    keys = _collect_keys(data, {})
+    mapping = {}
+    used = set(keys)
+    for key, count in keys.items():
+        words = re.findall(r"[A-Za-z0-9]+", key)
+        short = "".join(word[0] for word in words) if len(words) > 1 else key[:3]
+        if count < min_count or len(short) >= len(key):
+            mapping[key] = key
+            continue
+        candidate, n = short, 2
+        while candidate in used:
+            candidate, n = f"{short}{n}", n + 1
+        used.add(candidate)
+        mapping[key] = candidate
+    return mapping
+
+
+def _rename_keys(data, mapping):
+    if isinstance(data, dict):
+        return {mapping[key]: _rename_keys(value, mapping) for key, value in data.items()}
+    if isinstance(data, list):
+        return [_rename_keys(item, mapping) for item in data]
+    return data
+
+
+def _is_rep_list(data):
+    return (isinstance(data, list) and data and all(isinstance(r, dict) and "repetition" in r for r in data))
+
+
+def _has_rep_list(data):
+    if _is_rep_list(data):
+        return True
+    if isinstance(data, dict):
+        return any(_has_rep_list(value) for value in data.values())
+    if isinstance(data, list):
+        return any(_has_rep_list(item) for item in data)
+    return False
+
+
+def _rep_rows(reps):
+    rows = []
+    for rep in reps:
+        mistakes = rep.get("feedback", rep.get("mistakes")) or []
+        rows.append(f"{rep['repetition']}|{rep.get('state', '')}|{'; '.join(mistakes)}")
+    return rows
+
+
+def _tabular(data, indent=""):
+    # repetition lists at any depth become "rep|state|mistakes" rows, everything else falls back
+    # to minified JSON
+    if _is_rep_list(data):
+        return "\n".join([f"{indent}rep|state|mistakes"] + [indent + row for row in _rep_rows(data)])
+    if isinstance(data, dict) and _has_rep_list(data):
+        lines = []
+        for key, value in data.items():
+            if _has_rep_list(value):
+                lines.append(f"{indent}{key}:")
+                lines.append(_tabular(value, indent if _is_rep_list(value) else indent + "  "))
+            else:
+                lines.append(f"{indent}{key}: {json.dumps(value, ensure_ascii=False, separators=(',', ':'))}")
+        return "\n".join(lines)
+    if isinstance(data, list) and _has_rep_list(data):
+        return "\n".join(_tabular(item, indent) for item in data)
+    return indent + json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def encode(data, fmt="pretty", drop_empty=False):
+    """
+    Serialize prompt data in one of `FORMATS`.
+
+    Parameters:
+        data: The JSON-compatible section to embed in the prompt.
+        fmt (str): "pretty" (indent=4, what the scripts used so far), "minified", "abbreviated"
+            (minified with keys shortened to initials plus a legend) or "tabular"
+            (repetitions as "rep|state|mistakes" rows).
+        drop_empty (bool): Remove empty fields such as `"feedback": []` before encoding.
+
+    Returns:
+        str: The encoded text.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    if drop_empty:
+        data = omit_empty(data)
+
+    if fmt == "pretty":
+        return json.dumps(data, indent=4, ensure_ascii=False)
+    if fmt == "minified":
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    if fmt == "abbreviated":
+        mapping = abbreviations(data)
+        legend = ",".join(f"{short}={key}" for key, short in mapping.items() if short != key)
+        body = json.dumps(_rename_keys(data, mapping), ensure_ascii=False, separators=(",", ":"))
+        return f"Keys: {legend}\n{body}" if legend else body
+    return _tabular(data)
+
+
+def token_report(sections, formats=FORMATS, drop_empty=False, count_tokens=estimate_tokens):
+    """
+    Count tokens per section for every format.
+
+    Parameters:
+        sections (dict): Section name -> data, e.g. the top-level keys of a case.
+        formats (iterable): Formats to compare.
+        drop_empty (bool): Passed to `encode`.
+        count_tokens (callable): Token counter, a real tokenizer can be plugged in here.
+
+    Returns:
+        dict: {format: {section: tokens, ..., "total": tokens}}
+    """
+    report = {}
+    for fmt in formats:
+        counts = {name: count_tokens(encode(value, fmt, drop_empty)) for name, value in sections.items()}
+        counts["total"] = sum(counts.values())
+        report[fmt] = counts
+    return report
+
+
+def print_report(report):
+    sections = list(next(iter(report.values())))
+    width = max(len(name) for name in sections)
+    print(" " * width + "".join(f"{fmt:>13}" for fmt in report))
+    for name in sections:
+        print(f"{name:<{width}}" + "".join(f"{report[fmt][name]:>13}" for fmt in report))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare prompt encodings by token count")
+    parser.add_argument("path", help="JSON file with the prompt data, e.g. user_data.json")
+    parser.add_argument("--drop-empty", action="store_true")
+    args = parser.parse_args()
+
+    with open(args.path, encoding="utf-8") as f:
+        print_report(token_report(json.load(f), drop_empty=args.drop_empty))
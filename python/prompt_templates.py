@@ -0,0 +1,70 @@
+from string import Formatter
+
+from prompt_encoding import encode, estimate_tokens
+
+
+class CompiledTemplate:
+    """
+    A `str.format` template split once into static text and named slots.
+
+    Doubled braces are unescaped at compile time, so rendering is a single join of the
+    pre-rendered static pieces and the slot values instead of a full format pass.
+
+    Parameters:
+        name (str): Registry name of the template.
+        template (str): Template text with `{slot}` fields and `{{`/`}}` escapes.
+        encoding (str): `prompt_encoding` format used for slot values that are not strings.
+    """
+
+    def __init__(self, name, template, encoding="pretty"):
+        self.name = name
+        self.encoding = encoding
+        self.pieces = []
+        self.slots = []
+        # index of every slot in `pieces`, so render() only fills in the holes
+        self._slot_positions = []
+        static = []
+        for literal, field, spec, conversion in Formatter().parse(template):
+            static.append(literal)
+            if field is None:
+                continue
+            if spec or conversion:
+                raise ValueError(f"{name}: format specs are not supported in slot {field!r}")
+            self.pieces.append("".join(static))
+            static = []
+            self._slot_positions.append(len(self.pieces))
+            self.pieces.append(None)
+            self.slots.append(field)
+        self.pieces.append("".join(static))
+
+        self.static_prefix = self.pieces[0]
+        self.static_prefix_tokens = estimate_tokens(self.static_prefix)
+        self.static_tokens = sum(estimate_tokens(piece) for piece in self.pieces if piece)
+
+    def render(self, **values):
+        """
+        Assemble the prompt. Strings are inserted as they are, any other value is encoded
+        with the template's encoding first.
+        """
+        pieces = self.pieces.copy()
+        for position, slot in zip(self._slot_positions, self.slots):
+            value = values[slot]
+            pieces[position] = value if isinstance(value, str) else encode(value, self.encoding)
+        return "".join(pieces)
+
+
+# name -> CompiledTemplate, filled by prompts.py when it is imported
+TEMPLATES = {}
+
+
+def register(name, template, encoding="pretty"):
+    TEMPLATES[name] = CompiledTemplate(name, template, encoding)
+    return TEMPLATES[name]
+
+
+def get_template(name):
+    return TEMPLATES[name]
+
+
+def render(name, **values):
+    return TEMPLATES[name].render(**values)
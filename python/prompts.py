@@ -0,0 +1,145 @@
+from instrumentation import span
+from prompt_encoding import encode
+from prompt_templates import register
+
+
+COACHING_TEMPLATE = (
+    "You are an AI Assistant specialized in exercise coaching and motivation. "
+    "Your task is to provide feedback and personalized motivational messages based on the user's performance analysis and their personal details. "
+    "Consider the user's goals, preferences, and history to make the feedback effective and tailored to their needs. "
+    "Use the data provided in the JSON format below:\n\n"
+    "{input_json}\n\n"
+    "### Instructions:\n"
+    "1. Performance Feedback:\n"
+    "   Analyze the 'Squat Performance Analysis' data and identify issues with the user's squat performance. Provide constructive feedback to improve their form or execution.\n"
+    "2. Personalized Motivation:\n"
+    "   Use the user's 'User Personalization' data to craft motivational messages.\n"
+    "   - Reference their main exercise objectives to remind them of their long-term goals.\n"
+    "   - Incorporate their exercise preferences to align motivation with what they enjoy.\n"
+    "   - Acknowledge their greatest achievement to build confidence.\n"
+    "3. Tone and Style:\n"
+    "   - Keep your tone positive, empathetic, and encouraging.\n"
+    "   - Use simple language, avoiding overly technical terms unless necessary.\n"
+    "4. Health Considerations:\n"
+    "   Respect the user's medical history and suggest modifications if needed, ensuring the exercise is safe and sustainable.\n\n"
+    "### Expected Output Format:\n"
+    "#### Feedback Section:\n"
+    "Provide detailed feedback for each failed repetition in the 'Squat Performance Analysis'. Example:\n"
+    "- Repetition 0: [Feedback about the issue and how to fix it.]\n"
+    "#### Motivation Section:\n"
+    "Craft motivational messages based on their personal data. Example:\n"
+    "- 'Your goal to improve cardiovascular fitness and mental health is inspiring! Remember, every small effort counts toward this long-term journey.'\n"
+    "#### Safety Note Section:\n"
+    "Provide a safety or health-related recommendation based on the 'Medical History and Physical Condition' data. Example:\n"
+    "- 'Since you have a history of major injuries and respiratory issues, consult with a medical professional before attempting advanced movements.'"
+)
+
+# Structured JSON feedback prompt of llm-run-2-evaluated.py
+EVALUATED_PROMPT_TEMPLATE = """
+    **Task**: Generate structured exercise feedback in JSON format based on the following data:
+    
+    ### Input Data
+    1. User Profile:
+    {user_personalization}
+    
+    2. Current Session Analysis:
+    {squat_performance}
+    
+    3. Historical Feedback:
+    {history_feedback}
+    
+    ### Instructions
+    - Analyze ONLY repetitions with "IMPROPER" or "FAILED" states
+    - For each problematic repetition:
+      - Copy exact "repetition" number
+      - Keep original "state" value
+      - Combine all feedback points into one string separated by commas
+    - Create 3 motivational messages addressing:
+      1. Weight loss progress
+      2. Consistency encouragement
+      3. Specific form improvement
+    - Safety note should reference respiratory/cardiovascular history
+    
+    ### Required Output Format:
+    {{
+      "performance_feedback": [
+        {{
+          "rep": <repetition_number>,
+          "state": "<IMPROPER/FAILED>", 
+          "details": "<combined_feedback>"
+        }}
+      ],
+      "motivation": [
+        "<message1>",
+        "<message2>",
+        "<message3>"
+      ],
+      "safety": "<custom_health_note>"
+    }}
+    
+    ### Example Output:
+    {{
+      "performance_feedback": [
+        {{
+          "rep": 0,
+          "state": "IMPROPER",
+          "details": "Knees too low, Back not forward enough"
+        }}
+      ],
+      "motivation": [
+        "Your weight loss journey is inspiring...",
+        "Remember your 19kg achievement...",
+        "Focus on keeping knees aligned..."
+      ],
+      "safety": "Given your cardiovascular history..."
+    }}
+    
+    Now generate response for the provided data:
+    """
+
+# Used by run_ollama_fast: performance_feedback is built by rule_feedback, the model only writes the rest
+MOTIVATION_PROMPT_TEMPLATE = """
+    **Task**: Generate motivational exercise feedback in JSON format based on the following data:
+    
+    ### Input Data
+    1. User Profile:
+    {user_personalization}
+    
+    2. Current Session Summary:
+    {session_summary}
+    
+    3. Historical Feedback:
+    {history_feedback}
+    
+    ### Instructions
+    - Create 3 motivational messages addressing:
+      1. Weight loss progress
+      2. Consistency encouragement
+      3. Specific form improvement
+    - Safety note should reference respiratory/cardiovascular history
+    
+    ### Required Output Format:
+    {{
+      "motivation": [
+        "<message1>",
+        "<message2>",
+        "<message3>"
+      ],
+      "safety": "<custom_health_note>"
+    }}
+    
+    Now generate response for the provided data:
+    """
+
+
+# Every prompt variant is compiled once, when this module is imported
+COACHING = register("coaching", COACHING_TEMPLATE)
+EVALUATED = register("evaluated", EVALUATED_PROMPT_TEMPLATE)
+MOTIVATION = register("motivation", MOTIVATION_PROMPT_TEMPLATE)
+
+
+# Prompt Template
+def build_prompt(input_json, encoding="pretty", drop_empty=False):
+    # encoding/drop_empty select a prompt_encoding format, "pretty" keeps the original indent=4 JSON
+    with span("prompt_build"):
+        return COACHING.render(input_json=encode(input_json, encoding, drop_empty))
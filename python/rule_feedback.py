@@ -0,0 +1,68 @@
+from collections import Counter
+
+# Correction tips for every mistake string the pose analysis (and the case generators' feedback_pool) can emit
+MISTAKE_TIPS = {
+    "Your back is leaning too forward": "Keep your chest up and your back more upright as you lower down.",
+    "Your back is not forward enough": "Hinge slightly at the hips so your torso leans forward a little for balance.",
+    "Your knees are too low, making them closer to your toes":
+        "Push your hips back first so your knees stay behind your toes.",
+    "Your thighs drop too below your knees": "Stop the descent when your thighs are parallel to the floor.",
+}
+
+# A FAILED rep without mistakes did not go through all phases (Stand - Transition - Squat)
+INCOMPLETE_REP_TIP = "Complete the full movement: stand, lower into the squat, then return to standing."
+
+FAULTY_STATES = ("IMPROPER", "FAILED")
+
+
+def rep_mistakes(rep):
+    # llm-deep.py uses "mistakes" for the same list the other scripts call "feedback"
+    return rep.get("feedback", rep.get("mistakes")) or []
+
+
+def faulty_reps(analysis):
+    return [rep for rep in analysis if rep.get("state") in FAULTY_STATES]
+
+
+def rep_details(rep, include_tips=True):
+    mistakes = rep_mistakes(rep)
+    if not mistakes:
+        return INCOMPLETE_REP_TIP if rep.get("state") == "FAILED" else ""
+    details = ", ".join(mistakes)
+    if include_tips:
+        tips = [MISTAKE_TIPS[m] for m in mistakes if m in MISTAKE_TIPS]
+        if tips:
+            details = f"{details}. {' '.join(tips)}"
+    return details
+
+
+def build_performance_feedback(analysis, include_tips=True):
+    """
+    Build the `performance_feedback` section of the model output without calling the model.
+
+    Parameters:
+        analysis (list): The "Squat Performance Analysis" list of repetitions.
+        include_tips (bool): Append a correction tip for every known mistake.
+
+    Returns:
+        list: One {"rep", "state", "details"} entry per IMPROPER or FAILED repetition.
+    """
+    return [
+        {"rep": rep["repetition"], "state": rep["state"], "details": rep_details(rep, include_tips)}
+        for rep in faulty_reps(analysis)
+    ]
+
+
+def summarize_mistakes(analysis):
+    """
+    One-line summary of the session for prompts that no longer carry the full rep list,
+    e.g. "7/10 correct, 2 improper, 1 failed; most frequent: Your back is leaning too forward (2x)".
+    """
+    states = Counter(rep.get("state") for rep in analysis)
+    mistakes = Counter(m for rep in faulty_reps(analysis) for m in rep_mistakes(rep))
+    summary = (f"{states['CORRECT']}/{len(analysis)} correct, "
+               f"{states['IMPROPER']} improper, {states['FAILED']} failed")
+    if mistakes:
+        mistake, count = mistakes.most_common(1)[0]
+        summary += f"; most frequent: {mistake} ({count}x)"
+    return summary
@@ -0,0 +1,238 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+
+import instrumentation
+from ollama_client import DEFAULT_MAX_CONCURRENCY, get_client
+
+# Lower runs first
+INTERACTIVE = 0
+# work started ahead of an interactive request that is likely to follow, see precompute.py
+SPECULATIVE = 5
+BATCH = 10
+
+DEFAULT_MAX_QUEUE = 64
+
+
+class Overloaded(Exception):
+    """Raised for (or set on) a low-priority job that was shed because the queue is full."""
+
+
+class _Job:
+    def __init__(self, priority, fn=None, args=(), kwargs=None):
+        self.priority = priority
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.future = Future()
+        self.admitted = threading.Event()
+        self.enqueued = None
+        self.deferred = False
+
+
+class Scheduler:
+    """
+    Priority queue with admission control in front of the model server.
+
+    At most `max_concurrency` jobs run at once. Jobs of priority `shed_priority` and lower
+    (speculative and batch work) may not take the last `reserved` slots, so an interactive
+    request never waits behind them, and they are shed with `Overloaded` once `max_queue` jobs
+    are waiting; a job arriving at a full queue evicts the newest sheddable job of a lower
+    priority. A queued job can be `promote`d, e.g. once a user waits on a speculative one.
+
+    Parameters:
+        max_concurrency (int): Generations the model server sustains at the same time.
+        max_queue (int): Waiting jobs before low-priority work is shed.
+        reserved (int): Slots kept free for jobs with a priority below `shed_priority`.
+        shed_priority (int): Priorities from this value on can be deferred and shed.
+    """
+
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY, max_queue=DEFAULT_MAX_QUEUE, reserved=1,
+                 shed_priority=SPECULATIVE):
+        if reserved >= max_concurrency:
+            raise ValueError("reserved must leave at least one slot for low-priority work")
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.reserved = reserved
+        self.shed_priority = shed_priority
+        self._lock = threading.Lock()
+        self._queues = {}
+        self._running = 0
+        self._pool = ThreadPoolExecutor(max_concurrency)
+        self.shed = 0
+        self.deferred = 0
+        self._waits = {}
+
+    def _depth(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _enqueue(self, job):
+        with self._lock:
+            if self._depth() >= self.max_queue and not self._evict(job.priority):
+                if job.priority >= self.shed_priority:
+                    self.shed += 1
+                    raise Overloaded(f"queue full ({self.max_queue} waiting), priority {job.priority} shed")
+            job.enqueued = time.perf_counter()
+            self._queues.setdefault(job.priority, deque()).append(job)
+            self._dispatch()
+
+    def _evict(self, priority):
+        # caller holds the lock; the newest job of the lowest sheddable priority below `priority` makes room
+        for queued in sorted(self._queues, reverse=True):
+            if queued > priority and queued >= self.shed_priority and self._queues[queued]:
+                job = self._queues[queued].pop()
+                # a cancelled job just leaves the queue
+                if not job.future.done():
+                    self.shed += 1
+                    job.future.set_exception(Overloaded(f"shed for a priority {priority} job"))
+                job.admitted.set()
+                return True
+        return False
+
+    def _dispatch(self):
+        # caller holds the lock
+        for priority in sorted(self._queues):
+            queue = self._queues[priority]
+            while queue and self._running < self.max_concurrency:
+                if priority >= self.shed_priority and self._running >= self.max_concurrency - self.reserved:
+                    if not queue[0].deferred:
+                        queue[0].deferred = True
+                        self.deferred += 1
+                    return
+                job = queue.popleft()
+                self._running += 1
+                wait = time.perf_counter() - job.enqueued
+                stats = self._waits.setdefault(priority, [0, 0.0, 0.0])
+                stats[0] += 1
+                stats[1] += wait
+                stats[2] = max(stats[2], wait)
+                instrumentation.observe("queue_wait", wait, priority=priority)
+                if job.fn is not None:
+                    self._pool.submit(self._run, job)
+                else:
+                    job.admitted.set()
+            if self._running >= self.max_concurrency:
+                return
+
+    def _finish(self):
+        with self._lock:
+            self._running -= 1
+            self._dispatch()
+
+    def _run(self, job):
+        try:
+            if job.future.set_running_or_notify_cancel():
+                job.future.set_result(job.fn(*job.args, **job.kwargs))
+        except BaseException as e:
+            job.future.set_exception(e)
+        finally:
+            self._finish()
+
+    def submit(self, fn, *args, priority=BATCH, **kwargs):
+        """
+        Queue `fn(*args, **kwargs)`.
+
+        Returns:
+            Future: Resolves to the result of `fn`, or fails with `Overloaded` if the job is shed.
+
+        Raises:
+            Overloaded: If the job is shed right away.
+        """
+        job = _Job(priority, fn, args, kwargs)
+        self._enqueue(job)
+        return job.future
+
+    def ticket(self, priority=BATCH):
+        """A not yet queued `slot` request, for callers that may want to `promote` it later."""
+        return _Job(priority)
+
+    def promote(self, ticket, priority):
+        """
+        Raise a waiting or not yet queued `ticket` to `priority`.
+
+        Returns:
+            bool: False if the ticket already holds (or was shed from) its slot, or already
+            has that priority or a higher one.
+        """
+        with self._lock:
+            if ticket.admitted.is_set() or ticket.priority <= priority:
+                return False
+            if ticket.enqueued is not None:
+                self._queues[ticket.priority].remove(ticket)
+                ticket.deferred = False
+                self._queues.setdefault(priority, deque()).append(ticket)
+            ticket.priority = priority
+            self._dispatch()
+            return True
+
+    @contextmanager
+    def slot(self, priority=BATCH, ticket=None):
+        """
+        Block until a slot is granted and hold it for the `with` block, for callers that
+        consume a stream on their own thread. `ticket` comes from `ticket()` and overrides
+        `priority`.
+        """
+        job = ticket or _Job(priority)
+        self._enqueue(job)
+        job.admitted.wait()
+        if job.future.done():
+            # shed while waiting
+            job.future.result()
+        try:
+            yield
+        finally:
+            self._finish()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": self._running,
+                "queue_depth": self._depth(),
+                "queued": {priority: len(queue) for priority, queue in sorted(self._queues.items()) if queue},
+                "wait": {priority: {"count": count, "mean": total / count, "max": longest}
+                         for priority, (count, total, longest) in sorted(self._waits.items())},
+                "shed": self.shed,
+                "deferred": self.deferred,
+            }
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+
+class ScheduledClient:
+    """
+    `OllamaClient` lookalike whose generations go through `scheduler` at `priority`.
+    Pass it as `client=` like `CoalescingClient`.
+    """
+
+    def __init__(self, client=None, scheduler=None, priority=BATCH):
+        self.client = client or get_client()
+        self.scheduler = scheduler or get_scheduler()
+        self.priority = priority
+
+    def stream_generate(self, model, prompt, context=None, options=None, keep_alive=None, **extra):
+        with self.scheduler.slot(self.priority):
+            yield from self.client.stream_generate(model, prompt, context, options, keep_alive, **extra)
+
+    def generate(self, model, prompt, context=None, options=None, keep_alive=None, **extra):
+        with self.scheduler.slot(self.priority):
+            return self.client.generate(model, prompt, context, options, keep_alive, **extra)
+
+    def close(self):
+        self.client.close()
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Return the process-wide `Scheduler`, sized like the default client."""
+    global _default_scheduler
+    if _default_scheduler is None:
+        with _default_lock:
+            if _default_scheduler is None:
+                _default_scheduler = Scheduler(reserved=min(1, DEFAULT_MAX_CONCURRENCY - 1))
+    return _default_scheduler
@@ -0,0 +1,202 @@
+import threading
+
+from ollama_client import get_client
+from prompt_encoding import encode, estimate_tokens
+from stream_parser import FeedbackStreamParser, parse_response
+
+REQUIRED_SECTIONS = ("performance_feedback", "motivation", "safety")
+
+# Characters of prose tolerated outside the reasoning block before the JSON object starts
+MAX_PROSE_CHARS = 40
+
+SECTION_FORMATS = {
+    "performance_feedback": '{"performance_feedback": [{"rep": <integer>, "state": "<IMPROPER/FAILED>", '
+                            '"details": "<string>"}]}',
+    "motivation": '{"motivation": ["<string>", "<string>", "<string>"]}',
+    "safety": '{"safety": "<string>"}',
+    "suggestion": '{"suggestion": "<string>"}',
+}
+
+SECTION_INSTRUCTIONS = {
+    "performance_feedback": "List only the IMPROPER or FAILED repetitions of the squat performance analysis "
+                            "with a short tip on fixing each mistake.",
+    "motivation": "Write motivational messages tailored to the user's goals, preferences and history.",
+    "safety": "Write a safety or health recommendation based on the user's medical history and physical condition.",
+    "suggestion": "Suggest how many repetitions the user should do next session.",
+}
+
+STATS = {"aborts": 0, "retries": 0, "failed_retries": 0, "tokens_saved": 0}
+_stats_lock = threading.Lock()
+
+
+class SchemaViolation(Exception):
+    pass
+
+
+def _count(stats, name, amount=1):
+    with _stats_lock:
+        stats[name] += amount
+
+
+def check_item(key, value):
+    """Raise `SchemaViolation` if one streamed `(key, value)` event does not match the schema."""
+    if key == "performance_feedback":
+        if not isinstance(value, dict) or not {"rep", "state", "details"} <= value.keys():
+            raise SchemaViolation(f"performance_feedback entry must have rep, state and details: {value!r}")
+    elif key in ("motivation", "safety", "suggestion"):
+        if not isinstance(value, str):
+            raise SchemaViolation(f"{key} must be a string: {value!r}")
+
+
+def check_section(key, value):
+    """Raise `SchemaViolation` if a complete section value does not match the schema."""
+    if key in ("performance_feedback", "motivation"):
+        if not isinstance(value, list):
+            raise SchemaViolation(f"{key} must be an array: {value!r}")
+        for item in value:
+            check_item(key, item)
+    else:
+        check_item(key, value)
+
+
+class SchemaGuard:
+    """
+    Validates model output while it streams.
+
+    A section counts as present once its value is closed, so an array cut off after its first
+    items is reported by `missing()` (and its items by `partial()`), while an empty array that
+    was closed is present.
+
+    Parameters:
+        sections (tuple): Keys the top-level object must contain, any other key is a violation.
+        max_prose_chars (int): Prose tolerated after the reasoning block and before the JSON.
+    """
+
+    def __init__(self, sections=REQUIRED_SECTIONS, max_prose_chars=MAX_PROSE_CHARS):
+        self.sections = tuple(sections)
+        self.max_prose_chars = max_prose_chars
+        self.parser = FeedbackStreamParser()
+        self.valid = {}
+        self.closed = set()
+        self._checked_keys = 0
+
+    def feed(self, text):
+        """
+        Consume the next chunk of output.
+
+        Raises:
+            SchemaViolation: As soon as the output diverges from the schema.
+        """
+        events = self.parser.feed(text)
+        if self.parser.prose_chars > self.max_prose_chars:
+            raise SchemaViolation(f"{self.parser.prose_chars} characters of prose instead of JSON")
+        for key in self.parser.keys[self._checked_keys:]:
+            if key not in self.sections:
+                raise SchemaViolation(f"unexpected key {key!r}")
+        self._checked_keys = len(self.parser.keys)
+
+        for key, value in events:
+            try:
+                check_item(key, value)
+            except SchemaViolation:
+                self.closed.update(closed for closed in self.parser.closed if closed != key)
+                raise
+            if key in ("performance_feedback", "motivation"):
+                self.valid.setdefault(key, []).append(value)
+            else:
+                self.valid[key] = value
+        # only once every item checked out, a violation leaves its section unclosed
+        self.closed.update(self.parser.closed)
+        for key in self.closed:
+            if key in ("performance_feedback", "motivation"):
+                # e.g. `"performance_feedback": []` for an all-CORRECT session
+                self.valid.setdefault(key, [])
+        return events
+
+    def missing(self):
+        """Sections without a complete, valid value."""
+        return [key for key in self.sections if key not in self.valid or key not in self.closed]
+
+    def partial(self):
+        """Sections of which only the first items arrived."""
+        return [key for key in self.missing() if key in self.valid]
+
+
+def build_section_prompt(section, input_data):
+    """Small follow-up prompt that asks for a single missing section."""
+    return (
+        "You are an AI Assistant specialized in exercise coaching and motivation.\n"
+        f"{SECTION_INSTRUCTIONS[section]}\n\n"
+        f"Data:\n{encode(input_data, 'minified', drop_empty=True)}\n\n"
+        f"Return only this JSON, nothing else:\n{SECTION_FORMATS[section]}"
+    )
+
+
+def retry_section(section, input_data, model, client=None, options=None, stats=STATS):
+    """
+    Ask the model for one missing section.
+
+    Returns:
+        The validated section value, or None if the retry did not produce one either.
+    """
+    client = client or get_client()
+    _count(stats, "retries")
+    body = client.generate(model, build_section_prompt(section, input_data), options=options, format="json")
+    data = parse_response(body["response"])
+    value = data.get(section) if isinstance(data, dict) else None
+    try:
+        check_section(section, value)
+    except SchemaViolation:
+        value = None
+    if value is None:
+        _count(stats, "failed_retries")
+    return value
+
+
+def generate_validated(model, prompt, input_data, client=None, options=None, sections=REQUIRED_SECTIONS,
+                       on_event=None, stats=STATS):
+    """
+    Stream a feedback generation, cancel it as soon as it breaks the schema and fill in
+    missing sections with targeted retries instead of regenerating everything.
+
+    Parameters:
+        model (str): The name of the model to use.
+        prompt (str): The full feedback prompt.
+        input_data (dict): The data the prompt was built from, used for the retry prompts.
+        sections (tuple): Required top-level keys.
+        on_event (callable): Called with every valid `(key, value)` event as it streams in.
+        stats (dict): Counters for `aborts`, `retries`, `failed_retries` and `tokens_saved`;
+            `tokens_saved` estimates the output tokens of the sections a full regeneration
+            would have produced again.
+
+    Returns:
+        dict: The feedback, with every section that could be obtained.
+    """
+    client = client or get_client()
+    guard = SchemaGuard(sections)
+    stream = client.stream_generate(model, prompt, options=options)
+    try:
+        for body in stream:
+            for event in guard.feed(body.get("response", "")):
+                if on_event:
+                    on_event(event)
+    except SchemaViolation:
+        _count(stats, "aborts")
+    finally:
+        # closing the generator closes the HTTP response, which cancels the generation in Ollama
+        stream.close()
+
+    result = dict(guard.valid)
+    missing = guard.missing()
+    if missing:
+        _count(stats, "tokens_saved", sum(estimate_tokens(encode({key: value}, "minified"))
+                                          for key, value in result.items() if key not in missing))
+    for section in missing:
+        # a cut-off array is asked for again in full, its first items are kept only if that fails
+        value = retry_section(section, input_data, model, client, options, stats)
+        if value is not None:
+            result[section] = value
+            if on_event:
+                for item in (value if isinstance(value, list) else [value]):
+                    on_event((section, item))
+    return result
@@ -0,0 +1,155 @@
+import threading
+
+from ollama_client import get_client
+from prompt_cache import cache_key
+
+
+class _Flight:
+    def __init__(self, lock):
+        self.chunks = []
+        self.changed = threading.Condition(lock)
+        self.subscribers = 0
+        self.done = False
+        self.cancelled = False
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight generations.
+
+    The first caller for a key starts the generation on a background thread; callers
+    arriving while it runs replay the chunks received so far and then follow the same
+    stream instead of starting a generation of their own. The generation is cancelled once
+    every caller has stopped reading, and a finished key starts afresh (caching finished
+    responses is `PromptCache`'s job).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def stream(self, key, start):
+        """
+        Parameters:
+            key (str): Identity of the generation, e.g. `prompt_cache.cache_key(...)`.
+            start (callable): Returns the chunk iterator; only called if no flight for `key` is running.
+
+        Returns:
+            iterator: The chunks of the generation, from the first one.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight(self._lock)
+                self.started += 1
+                threading.Thread(target=self._pump, args=(key, flight, start), daemon=True).start()
+            else:
+                self.coalesced += 1
+            flight.subscribers += 1
+        return self._follow(key, flight)
+
+    def join(self, key):
+        """Follow the running generation for `key` from its first chunk, or None if there is none."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                return None
+            self.coalesced += 1
+            flight.subscribers += 1
+        return self._follow(key, flight)
+
+    def call(self, key, fn):
+        """Coalesced `fn()` for generation functions that return their result in one piece."""
+        return list(self.stream(key, lambda: iter((fn(),))))[0]
+
+    def _release(self, key, flight):
+        # caller holds self._lock
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _pump(self, key, flight, start):
+        source = None
+        try:
+            source = iter(start())
+            for chunk in source:
+                with self._lock:
+                    if flight.cancelled:
+                        break
+                    flight.chunks.append(chunk)
+                    flight.changed.notify_all()
+        except Exception as e:
+            flight.error = e
+        finally:
+            # closing the source generator closes the HTTP response, which cancels the generation
+            close = getattr(source, "close", None)
+            if close:
+                close()
+            with self._lock:
+                flight.done = True
+                self._release(key, flight)
+                flight.changed.notify_all()
+
+    def _follow(self, key, flight):
+        i = 0
+        try:
+            while True:
+                with self._lock:
+                    while i >= len(flight.chunks) and not flight.done:
+                        flight.changed.wait()
+                    if i < len(flight.chunks):
+                        chunk = flight.chunks[i]
+                        i += 1
+                    elif flight.error is not None:
+                        raise flight.error
+                    else:
+                        return
+                yield chunk
+        finally:
+            with self._lock:
+                flight.subscribers -= 1
+                if flight.subscribers == 0 and not flight.done:
+                    flight.cancelled = True
+                    self._release(key, flight)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "started": self.started,
+                "generations_saved": self.coalesced,
+                "in_flight": len(self._flights),
+            }
+
+
+class CoalescingClient:
+    """
+    Drop-in replacement for `OllamaClient` that shares identical concurrent generations.
+
+    Requests are identical when model, prompt, options, context and any extra payload
+    fields such as `format` match. Pass it as `client=` to `main.generate`,
+    `run_ollama_http`, `run_batch` or `generate_validated`.
+    """
+
+    def __init__(self, client=None, flights=None):
+        self.client = client or get_client()
+        self.flights = flights or SingleFlight()
+
+    def stream_generate(self, model, prompt, context=None, options=None, keep_alive=None, **extra):
+        key = cache_key(model, prompt, options={**(options or {}), **extra}, context=context)
+        return self.flights.stream(key, lambda: self.client.stream_generate(model, prompt, context, options,
+                                                                            keep_alive, **extra))
+
+    def generate(self, model, prompt, context=None, options=None, keep_alive=None, **extra):
+        parts = []
+        body = {}
+        for body in self.stream_generate(model, prompt, context, options, keep_alive, **extra):
+            parts.append(body.get("response", ""))
+        return {**body, "response": "".join(parts)}
+
+    def stats(self):
+        return self.flights.stats()
+
+    def close(self):
+        self.client.close()
@@ -0,0 +1,259 @@
+import json
+
+from instrumentation import span
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+
+class FeedbackStreamParser:
+    """
+    Incremental parser for the feedback JSON the models stream back.
+
+    Text is fed chunk by chunk; `<think>...</think>` reasoning blocks and any prose or code
+    fences before the JSON object are skipped. Every time a value of the top-level object is
+    complete an event is returned: one `(key, item)` event per element for array values
+    (`performance_feedback` entries, `motivation` messages) and one `(key, value)` event for
+    everything else (`safety`). `closed` lists the keys whose value has been read in full,
+    including empty arrays, which produce no event.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.keys = []
+        self.closed = []
+        self.array_keys = set()
+        self.prose_chars = 0
+        self.done = False
+        self._pending = ""
+        self._in_think = False
+        self._started = False
+        self._json = ""
+        self._end = None
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._key = None
+        self._expect = "key"
+        self._value_start = None
+        self._element_start = None
+        # end of the last complete value or array element, and the brackets open there
+        self._cut = None
+
+    # -- pre-JSON text ---------------------------------------------------------------------
+
+    def feed(self, text):
+        """
+        Consume the next chunk of model output.
+
+        Returns:
+            list: The `(key, value)` events completed by this chunk.
+        """
+        if self.done:
+            return []
+        self._pending += text
+        events = []
+        while self._pending and not self.done:
+            if self._in_think:
+                end = self._pending.find(THINK_CLOSE)
+                if end < 0:
+                    self._pending = self._pending[-(len(THINK_CLOSE) - 1):]
+                    break
+                self._pending = self._pending[end + len(THINK_CLOSE):]
+                self._in_think = False
+            elif not self._started:
+                think = self._pending.find(THINK_OPEN)
+                brace = self._pending.find("{")
+                if think >= 0 and (brace < 0 or think < brace):
+                    self._skip(self._pending[:think])
+                    self._pending = self._pending[think + len(THINK_OPEN):]
+                    self._in_think = True
+                elif brace >= 0:
+                    self._skip(self._pending[:brace])
+                    self._pending = self._pending[brace:]
+                    self._started = True
+                else:
+                    # prose before the JSON, keep only what could be the start of "<think>"
+                    keep = len(THINK_OPEN) - 1
+                    self._skip(self._pending[:-keep])
+                    self._pending = self._pending[-keep:]
+                    break
+            else:
+                chunk, self._pending = self._pending, ""
+                events.extend(self._scan(chunk))
+        self.events.extend(events)
+        return events
+
+    def _skip(self, text):
+        # count prose outside reasoning blocks, a ```json fence around the object is fine
+        self.prose_chars += len("".join(text.replace("```json", "").replace("```", "").split()))
+
+    # -- JSON scanner ----------------------------------------------------------------------
+
+    def _text(self, start, end):
+        return self._json[start:end]
+
+    def _emit(self, start, end, events):
+        try:
+            value = json.loads(self._text(start, end))
+        except json.JSONDecodeError:
+            return
+        events.append((self._key, value))
+
+    def _scan(self, chunk):
+        events = []
+        base = len(self._json)
+        self._json += chunk
+        for offset, ch in enumerate(chunk):
+            if self.done:
+                break
+            pos = base + offset
+            depth = len(self._stack)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = self._text(self._string_start, pos + 1)
+                    if depth == 1 and self._expect == "key":
+                        self._key = json.loads(self._last_string)
+                        self.keys.append(self._key)
+                        self._expect = "colon"
+                    elif depth == 1 and self._value_start == self._string_start:
+                        self._emit(self._value_start, pos + 1, events)
+                        self._close_value(pos + 1)
+                    elif depth == 2 and self._stack[1] == "[" and self._element_start == self._string_start:
+                        self._finish_element(pos + 1, events)
+                continue
+
+            if ch.isspace():
+                continue
+
+            if depth == 1 and self._expect == "value":
+                self._value_start = pos
+                self._expect = "after_value"
+                if ch == "[":
+                    self.array_keys.add(self._key)
+            elif depth == 2 and self._stack[1] == "[" and self._element_start is None and ch not in ",]":
+                self._element_start = pos
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif ch in "{[":
+                self._stack.append(ch)
+            elif ch in "}]":
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                depth = len(self._stack)
+                if depth == 0:
+                    self._finish_scalar(pos, events)
+                    self.done = True
+                    self._end = pos + 1
+                elif depth == 1 and self._value_start is not None and ch == "]" \
+                        and self._text(self._value_start, self._value_start + 1) == "[":
+                    self._finish_element(pos, events)
+                    self._close_value(pos + 1)
+                elif depth == 1 and self._value_start is not None and ch == "}":
+                    self._emit(self._value_start, pos + 1, events)
+                    self._close_value(pos + 1)
+                elif depth == 2 and self._stack[1] == "[" and self._element_start is not None:
+                    self._finish_element(pos + 1, events)
+            elif ch == ":" and depth == 1 and self._expect == "colon":
+                self._expect = "value"
+            elif ch == ",":
+                if depth == 1:
+                    self._finish_scalar(pos, events)
+                    self._expect = "key"
+                elif depth == 2 and self._stack[1] == "[":
+                    self._finish_element(pos, events)
+        return events
+
+    def _finish_scalar(self, pos, events):
+        # numbers, true/false/null end at the next "," or "}" of the top-level object
+        if self._value_start is not None:
+            self._emit(self._value_start, pos, events)
+            self._close_value(pos)
+
+    def _close_value(self, end):
+        self.closed.append(self._key)
+        self._value_start = None
+        self._cut = (end, "}")
+
+    def _finish_element(self, end, events):
+        if self._element_start is not None:
+            self._emit(self._element_start, end, events)
+            self._element_start = None
+            self._cut = (end, "]}")
+
+    # -- results ---------------------------------------------------------------------------
+
+    def json_text(self):
+        return self._json[:self._end]
+
+    def repaired_text(self):
+        """
+        The JSON seen so far, cut back to the last complete top-level value or array element
+        and closed there, so a half-written value such as `{"rep": 1, "state": "F` is dropped
+        instead of being closed.
+        """
+        text = self.json_text()
+        if self.done or not text:
+            return text
+        if self._cut is None:
+            return "{}"
+        end, closers = self._cut
+        return text[:end] + closers
+
+    def result(self):
+        """
+        Returns:
+            dict: The parsed document, repaired if the stream ended early, or None if nothing
+            usable was received.
+        """
+        for text in (self.json_text(), self.repaired_text()):
+            try:
+                data = json.loads(text)
+            except json.JSONDecodeError:
+                continue
+            return data if data or self.done else None
+        # fall back to the values that were completed before the stream broke off
+        data = {}
+        for key, value in self.events:
+            if key in self.array_keys:
+                data.setdefault(key, []).append(value)
+            else:
+                data[key] = value
+        return data or None
+
+
+def iter_events(chunks):
+    """
+    Yield `(key, value)` events from a stream of text chunks or Ollama chunk dicts, e.g. the
+    output of `OllamaClient.stream_generate`.
+    """
+    parser = FeedbackStreamParser()
+    for chunk in chunks:
+        text = chunk.get("response", "") if isinstance(chunk, dict) else chunk
+        yield from parser.feed(text)
+
+
+def strip_reasoning(response):
+    """Remove `<think>` blocks and anything before the JSON object."""
+    parser = FeedbackStreamParser()
+    parser.feed(response)
+    return parser.json_text()
+
+
+def parse_response(response):
+    """Parse a complete model response, tolerating reasoning blocks and a truncated tail."""
+    with span("validate"):
+        parser = FeedbackStreamParser()
+        parser.feed(response)
+        return parser.result()
@@ -0,0 +1,217 @@
+import threading
+from datetime import date as Date
+
+from history_compactor import HistoryAggregate
+from user_store import to_iso
+
+# Weight of the newest session in the moving averages
+EMA_ALPHA = 0.3
+
+_update_lock = threading.Lock()
+
+
+def _ema(previous, value, alpha):
+    return value if previous is None else alpha * value + (1 - alpha) * previous
+
+
+class UserAggregate:
+    """
+    Running per-user aggregate, updated once per submitted session and rating.
+
+    Extends `HistoryAggregate` (state and mistake counts, CORRECT-rate trend, mean score) with
+    exponential moving averages of the CORRECT rate and of motivation_score, a streak of
+    sessions without a FAILED rep and a streak of consecutive training days. Every update costs
+    O(reps in the session). Sessions and ratings must be added in (date, session) order, which
+    `follows_session`/`follows_rating` check; anything else (a resubmitted or late session, a
+    changed rating) is handled by `submit_session`/`submit_evaluation` with a rebuild.
+
+    Parameters:
+        alpha (float): Weight of the newest value in the moving averages.
+    """
+
+    def __init__(self, alpha=EMA_ALPHA):
+        self.alpha = alpha
+        self.history = HistoryAggregate()
+        self.last_session = None
+        # [ISO date, session] of the last session and of the last rating folded in
+        self.last_key = None
+        self.last_rated = None
+        self.ema_correct_rate = None
+        self.ema_motivation_score = None
+        self.clean_streak = 0
+        self.best_clean_streak = 0
+        self.day_streak = 0
+        self.best_day_streak = 0
+        self.last_day = None
+
+    def follows_session(self, key):
+        """True if a session with order key `[ISO date, session]` can be added incrementally."""
+        if self.last_key is None:
+            return self.history.sessions == 0
+        return key > self.last_key
+
+    def follows_rating(self, key):
+        """True if a first rating of the session with order key `key` can be added incrementally."""
+        if self.last_rated is None:
+            return self.history.score_count == 0
+        return key > self.last_rated
+
+    def add_session(self, session):
+        """Fold in one finished session, `{"session", "date", "performance"}`."""
+        self.last_session = session.get("session")
+        if session.get("date"):
+            self.last_key = [to_iso(session["date"]), session.get("session")]
+        self.history.add_performance(session)
+
+        reps = session.get("performance", [])
+        if reps:
+            correct = sum(rep.get("state") == "CORRECT" for rep in reps)
+            self.ema_correct_rate = _ema(self.ema_correct_rate, correct / len(reps), self.alpha)
+
+        if any(rep.get("state") == "FAILED" for rep in reps):
+            self.clean_streak = 0
+        else:
+            self.clean_streak += 1
+            self.best_clean_streak = max(self.best_clean_streak, self.clean_streak)
+
+        if session.get("date"):
+            day = Date.fromisoformat(to_iso(session["date"]))
+            gap = None if self.last_day is None else (day - Date.fromisoformat(self.last_day)).days
+            if gap is not None and gap < 0:
+                # an earlier day does not extend or break the streak
+                return
+            if gap is None or gap > 1:
+                self.day_streak = 1
+            elif gap == 1:
+                self.day_streak += 1
+            self.best_day_streak = max(self.best_day_streak, self.day_streak)
+            self.last_day = day.isoformat()
+
+    def add_rating(self, motivation_score, key=None):
+        """Fold in the first rating of the session with order key `key`, `[ISO date, session]`."""
+        if key is not None:
+            self.last_rated = key
+        self.history.add_feedback({"motivation_score": motivation_score})
+        self.ema_motivation_score = _ema(self.ema_motivation_score, motivation_score, self.alpha)
+
+    def summary(self):
+        """Prompt- and dashboard-ready view, see also `HistoryAggregate.summary`."""
+        return {
+            **self.history.summary(),
+            "recent_correct_rate": None if self.ema_correct_rate is None else round(self.ema_correct_rate, 2),
+            "recent_motivation_score": (None if self.ema_motivation_score is None
+                                        else round(self.ema_motivation_score, 2)),
+            "sessions_without_failed_reps": self.clean_streak,
+            "best_sessions_without_failed_reps": self.best_clean_streak,
+            "training_day_streak": self.day_streak,
+            "best_training_day_streak": self.best_day_streak,
+        }
+
+    def to_dict(self):
+        return {
+            "alpha": self.alpha,
+            "history": self.history.to_dict(),
+            "last_session": self.last_session,
+            "last_key": self.last_key,
+            "last_rated": self.last_rated,
+            "ema_correct_rate": self.ema_correct_rate,
+            "ema_motivation_score": self.ema_motivation_score,
+            "clean_streak": self.clean_streak,
+            "best_clean_streak": self.best_clean_streak,
+            "day_streak": self.day_streak,
+            "best_day_streak": self.best_day_streak,
+            "last_day": self.last_day,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregate = cls(data["alpha"])
+        aggregate.history = HistoryAggregate.from_dict(data["history"])
+        for name in ("last_session", "ema_correct_rate", "ema_motivation_score", "clean_streak",
+                     "best_clean_streak", "day_streak", "best_day_streak", "last_day"):
+            setattr(aggregate, name, data[name])
+        # missing in aggregates stored before they were tracked, the next submit rebuilds those
+        aggregate.last_key = data.get("last_key")
+        aggregate.last_rated = data.get("last_rated")
+        return aggregate
+
+
+def evaluation_score(evaluation):
+    """
+    motivation_score of an `/api/submit-evaluate` body, `{type_question: {"statement", "ratings"}}`:
+    the mean of the answered ratings, or None.
+    """
+    ratings = [item.get("ratings") for item in evaluation.values() if isinstance(item, dict)]
+    ratings = [rating for rating in ratings if rating is not None]
+    return sum(ratings) / len(ratings) if ratings else None
+
+
+def load_aggregate(store, user_id):
+    data = store.get_aggregate(user_id)
+    return UserAggregate.from_dict(data) if data else UserAggregate()
+
+
+def submit_session(store, user_id, session, day, performance):
+    """
+    Store a finished session and fold it into the user's persisted aggregate.
+
+    A new session that follows the ones already stored is folded in incrementally. A resubmitted
+    session, whose earlier analysis must be taken out again, or one dated before the latest
+    stored session rebuilds the aggregate from the store.
+
+    Returns:
+        UserAggregate: The updated aggregate.
+    """
+    with _update_lock:
+        resubmitted = store.get_session(user_id, session) is not None
+        store.add_session(user_id, session, day, performance)
+        aggregate = load_aggregate(store, user_id)
+        if resubmitted or not aggregate.follows_session([to_iso(day), session]):
+            return _rebuild(store, user_id, aggregate.alpha)
+        aggregate.add_session({"session": session, "date": day, "performance": performance})
+        store.put_aggregate(user_id, aggregate.to_dict())
+    return aggregate
+
+
+def submit_evaluation(store, user_id, session, evaluation, motivation=None):
+    """
+    Store the user's rating of the feedback of `session` and fold it into the aggregate.
+
+    Parameters:
+        evaluation (dict | float): The `/api/submit-evaluate` body, or a motivation_score.
+        motivation (list): The motivational messages that were rated.
+
+    Returns:
+        UserAggregate: The updated aggregate.
+    """
+    score = evaluation if isinstance(evaluation, (int, float)) else evaluation_score(evaluation)
+    with _update_lock:
+        stored = store.get_session(user_id, session)
+        store.set_feedback(user_id, session, motivation, score)
+        aggregate = load_aggregate(store, user_id)
+        if score is None or stored is None:
+            return aggregate
+        key = [to_iso(stored["date"]), session]
+        if stored.get("motivation_score") is not None or not aggregate.follows_rating(key):
+            # a changed rating replaces the earlier one, a late one changes the moving average
+            return _rebuild(store, user_id, aggregate.alpha)
+        aggregate.add_rating(score, key)
+        store.put_aggregate(user_id, aggregate.to_dict())
+    return aggregate
+
+
+def _rebuild(store, user_id, alpha):
+    # caller holds _update_lock
+    aggregate = UserAggregate(alpha)
+    for session in store.latest_sessions(user_id, -1):
+        aggregate.add_session(session)
+        if session.get("motivation_score") is not None:
+            aggregate.add_rating(session["motivation_score"], [to_iso(session["date"]), session["session"]])
+    store.put_aggregate(user_id, aggregate.to_dict())
+    return aggregate
+
+
+def rebuild_aggregate(store, user_id, alpha=EMA_ALPHA):
+    """Recompute a user's aggregate from all stored sessions, e.g. after `import_user_data`."""
+    with _update_lock:
+        return _rebuild(store, user_id, alpha)
@@ -0,0 +1,237 @@
+import argparse
+import json
+import sqlite3
+import threading
+import time
+from datetime import date as Date, datetime
+
+DATE_FORMAT = "%d/%m/%Y"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    personalization TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    user_id TEXT NOT NULL,
+    session TEXT NOT NULL,
+    date TEXT NOT NULL,
+    performance TEXT NOT NULL,
+    motivation TEXT,
+    motivation_score INTEGER,
+    PRIMARY KEY (user_id, session)
+);
+CREATE INDEX IF NOT EXISTS sessions_user_date ON sessions (user_id, date, session);
+CREATE TABLE IF NOT EXISTS aggregates (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+
+def to_iso(day):
+    """"01/03/2025" (the user_data.json format) -> "2025-03-01", which sorts chronologically."""
+    return datetime.strptime(day, DATE_FORMAT).date().isoformat()
+
+
+def from_iso(day):
+    return Date.fromisoformat(day).strftime(DATE_FORMAT)
+
+
+def _session_entry(row):
+    session, day, performance, motivation, score = row
+    entry = {"session": session, "date": from_iso(day), "performance": json.loads(performance)}
+    if motivation is not None:
+        entry["motivation"] = json.loads(motivation)
+    if score is not None:
+        entry["motivation_score"] = score
+    return entry
+
+
+class UserStore:
+    """
+    SQLite store of users, their per-session squat analyses and the feedback they were given.
+
+    Sessions are indexed on (user_id, date, session), so the latest sessions of one user are a
+    single index range scan instead of a parse of the whole user file.
+
+    Parameters:
+        path (str): SQLite database file, ":memory:" keeps the store in memory.
+    """
+
+    def __init__(self, path=":memory:"):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+
+    def put_user(self, user_id, personalization):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO users (user_id, personalization, updated) VALUES (?, ?, ?)",
+                             (user_id, json.dumps(personalization, ensure_ascii=False), time.time()))
+            self._db.commit()
+
+    def get_user(self, user_id):
+        """The personalization of `user_id`, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT personalization FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def users(self):
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT user_id FROM users ORDER BY user_id")]
+
+    def add_session(self, user_id, session, day, performance, motivation=None, motivation_score=None):
+        """
+        Store one session, or replace its date and analysis. Feedback and rating already stored
+        for the session are kept unless new ones are given.
+
+        Parameters:
+            user_id (str): The user.
+            session (str): Session id, e.g. "s_004".
+            day (str): Date in the user_data.json format, "DD/MM/YYYY".
+            performance (list): The "Squat Performance Analysis" reps of the session.
+            motivation (list): Motivational messages given after the session.
+            motivation_score (int): The user's rating of those messages.
+        """
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO sessions (user_id, session, date, performance, motivation, motivation_score) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (user_id, session) DO UPDATE SET "
+                "date = excluded.date, performance = excluded.performance, "
+                "motivation = COALESCE(excluded.motivation, motivation), "
+                "motivation_score = COALESCE(excluded.motivation_score, motivation_score)",
+                (user_id, session, to_iso(day), json.dumps(performance, ensure_ascii=False),
+                 None if motivation is None else json.dumps(motivation, ensure_ascii=False), motivation_score))
+            self._db.commit()
+
+    def set_feedback(self, user_id, session, motivation=None, motivation_score=None):
+        """Attach the feedback given for a stored session and/or the user's rating of it."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE sessions SET motivation = COALESCE(?, motivation), "
+                "motivation_score = COALESCE(?, motivation_score) WHERE user_id = ? AND session = ?",
+                (None if motivation is None else json.dumps(motivation, ensure_ascii=False), motivation_score,
+                 user_id, session))
+            self._db.commit()
+
+    def get_session(self, user_id, session):
+        """One stored session in the `latest_sessions` shape, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT session, date, performance, motivation, motivation_score FROM sessions "
+                "WHERE user_id = ? AND session = ?", (user_id, session)).fetchone()
+        return _session_entry(row) if row else None
+
+    def latest_sessions(self, user_id, n=3):
+        """
+        The last `n` sessions of `user_id`, oldest first, in one indexed query; `n=-1` returns all.
+
+        Returns:
+            list: Dicts with `session`, `date`, `performance` and, once given, `motivation`
+            and `motivation_score`.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT session, date, performance, motivation, motivation_score FROM sessions "
+                "WHERE user_id = ? ORDER BY date DESC, session DESC LIMIT ?", (user_id, n)).fetchall()
+        return [_session_entry(row) for row in reversed(rows)]
+
+    def user_data(self, user_id, history=3):
+        """
+        Rebuild the user_data.json shape for `user_id`: the latest session is the current
+        `squat_performance`, the `history` sessions before it are the `feedback_history`.
+
+        Returns:
+            dict: The user data, or None for an unknown user.
+
+        Raises:
+            ValueError: If `history` is negative.
+        """
+        if history < 0:
+            raise ValueError(f"history must be 0 or more, got {history}")
+        personalization = self.get_user(user_id)
+        if personalization is None:
+            return None
+        sessions = self.latest_sessions(user_id, history + 1)
+        current = sessions.pop() if sessions else {"performance": []}
+        return {
+            "user_personalization": {"User Personalization": personalization},
+            "squat_performance": {"Squat Performance Analysis": current["performance"]},
+            "feedback_history": sessions,
+        }
+
+    def get_aggregate(self, user_id):
+        """The stored running aggregate of `user_id` (see user_aggregates.py), or None."""
+        with self._lock:
+            row = self._db.execute("SELECT data FROM aggregates WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_aggregate(self, user_id, data):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO aggregates (user_id, data, updated) VALUES (?, ?, ?)",
+                             (user_id, json.dumps(data, ensure_ascii=False), time.time()))
+            self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def import_user_data(store, data, user_id=None, session=None, day=None):
+    """
+    Import one user in the user_data.json shape.
+
+    Parameters:
+        store (UserStore): Target store.
+        data (dict): `user_personalization`, `squat_performance` and `feedback_history`.
+        user_id (str): Defaults to the user's Name.
+        session (str): Id of the current `squat_performance` session, defaults to the one after
+            the last history session ("s_004" after "s_003").
+        day (str): Date of the current session, "DD/MM/YYYY", defaults to today.
+
+    Returns:
+        str: The user id.
+    """
+    personalization = data["user_personalization"].get("User Personalization", data["user_personalization"])
+    user_id = user_id or personalization["User Identification"]["Name"]
+    store.put_user(user_id, personalization)
+
+    history = data.get("feedback_history", [])
+    for entry in history:
+        store.add_session(user_id, entry["session"], entry["date"], entry.get("performance", []),
+                          entry.get("motivation"), entry.get("motivation_score"))
+
+    analysis = data.get("squat_performance", {}).get("Squat Performance Analysis")
+    if analysis is not None:
+        if session is None:
+            session = f"s_{len(history) + 1:03d}"
+        store.add_session(user_id, session, day or Date.today().strftime(DATE_FORMAT), analysis)
+    return user_id
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import or export user data")
+    parser.add_argument("--db", default="users.db")
+    commands = parser.add_subparsers(dest="command", required=True)
+    load = commands.add_parser("import", help="import user_data.json files")
+    load.add_argument("paths", nargs="+")
+    dump = commands.add_parser("export", help="print one user in the user_data.json shape")
+    dump.add_argument("user_id")
+    dump.add_argument("--history", type=int, default=3)
+    args = parser.parse_args()
+
+    with UserStore(args.db) as store:
+        if args.command == "import":
+            for path in args.paths:
+                with open(path) as f:
+                    print(import_user_data(store, json.load(f)))
+        else:
+            print(json.dumps(store.user_data(args.user_id, args.history), indent=2, ensure_ascii=False))
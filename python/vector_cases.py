@@ -0,0 +1,230 @@
+import numpy as np
+
+# Mirrors the option lists of generate_variety_case.py / generate_variety_case_1.py in their key order.
+# Every field is stored as a small integer code per case and only turned back into strings in
+# CaseBatch.case(). "sample" fields pick between 1 and (generic max, japanese max) options.
+PERSONALIZATION_FIELDS = [
+    ("Exercise Objectives", "Main Objective", "sample", [
+        "Increase muscle strength", "Lose weight", "Improve cardiovascular fitness", "Improving flexibility",
+        "Injury rehabilitation", "Preparing for competitions", "Improve mental health"], (3, 2)),
+    ("Exercise Objectives", "Timeframe", "choice", ["1-3 months", "3-6 months", "6-12 months", "More than 12 months"]),
+    ("Exercise Objectives", "Past Goals", "choice", ["Yes", "No"]),
+    ("Exercise Objectives", "Past Goals Result", "choice", ["Achieved", "Failed", "N/A"]),
+    ("Discipline & Exercise Habits", "Weekly Frequency", "choice", ["1 time", "2-3 times", "4-5 times", "Every day"]),
+    ("Discipline & Exercise Habits", "Duration", "choice",
+     ["<30 minutes", "30-60 minutes", "60-90 minutes", ">90 minutes"]),
+    ("Discipline & Exercise Habits", "Regular Schedule", "choice", ["Yes", "No"]),
+    ("Discipline & Exercise Habits", "Consistency Difficulty", "choice",
+     ["Very difficult", "Somewhat difficult", "Neutral", "Somewhat easy", "Very easy"]),
+    ("Exercise Preferences", "Preferred Exercise", "sample", [
+        "Weightlifting", "Cardio", "Yoga or Pilates", "HIIT", "Team sports", "Home workouts"], (3, 2)),
+    ("Exercise Preferences", "Group Preference", "choice", ["Individual", "Small group", "Large group"]),
+    ("Exercise Preferences", "Variety Importance", "choice",
+     ["Very important", "Quite important", "Not too important", "Not important at all"]),
+    ("Progress and Achievements", "Participated Structured Program", "choice", ["Yes", "No"]),
+    ("Progress and Achievements", "Progress Result", "choice", ["Very good", "Good", "Fair", "Poor", "N/A"]),
+    ("Progress and Achievements", "Greatest Achievement", "achievement", None),
+    ("Intrinsic and Extrinsic Motivation", "Main Reason", "sample", [
+        "For long-term health", "For physical appearance", "To reduce stress or anxiety", "To increase energy",
+        "To gain social recognition"], (2, 2)),
+    ("Intrinsic and Extrinsic Motivation", "Motivation Type", "choice",
+     ["External rewards", "Internal satisfaction", "Both in balance"]),
+    ("Intrinsic and Extrinsic Motivation", "Support Need", "choice", ["Yes", "No", "Not sure"]),
+    ("Mental Health and Emotions", "Emotional State", "choice", ["Very good", "Good", "Fair", "Bad", "Very bad"]),
+    ("Mental Health and Emotions", "Stress Level", "choice", ["Never", "Sometimes", "Often", "Very often"]),
+    ("Mental Health and Emotions", "Exercise Helps Stress", "choice", ["Yes", "No", "Not sure"]),
+    ("Social Support", "Supportive Friends/Family", "choice", ["Yes", "No"]),
+    ("Social Support", "Training with Others", "choice", ["Always", "Sometimes", "Rarely", "Never"]),
+    ("Social Support", "Support Importance", "choice",
+     ["Very important", "Quite important", "Not very important", "Not important at all"]),
+    ("Medical History and Physical Condition", "Injury History", "choice", ["None", "Minor injury", "Major injury"]),
+    ("Medical History and Physical Condition", "Current Medication", "choice", ["Yes", "No"]),
+    ("Medical History and Physical Condition", "Respiratory/Cardiovascular Issues", "choice", ["Yes", "No"]),
+]
+
+ACHIEVEMENTS = [
+    "Successfully completed a 10 km run in under an hour",
+    "Achieved a personal best squat of {squat_weight} kg",
+    "Lost {weight_loss} kg of weight in {months} months through consistent training",
+    "Improved flexibility by being able to perform a full split",
+    "Recovered fully from a major injury after consistent rehabilitation exercises",
+    "Won first place in a local fitness competition",
+    "Successfully performed {pushups} consecutive push-ups",
+    "Increased endurance by completing a {cycling_hours}-hour cycling session",
+    "Gained {muscle_gain} kg of muscle mass in {months} months",
+    "Successfully maintained a regular exercise schedule for {weeks_consistent} weeks without skipping a session",
+]
+
+# parameter -> inclusive range, as drawn in generate_greatest_achievement()
+ACHIEVEMENT_PARAMS = {
+    "weight_loss": (5, 20),
+    "squat_weight": (50, 150),
+    "months": (1, 12),
+    "pushups": (20, 100),
+    "cycling_hours": (2, 8),
+    "muscle_gain": (1, 10),
+    "weeks_consistent": (4, 24),
+}
+
+GENDERS = ["Male", "Female"]
+MALE_NAMES = ["Hiroshi", "Kenji", "Takeshi", "Yuki", "Souta", "Haruto", "Kaito", "Ren", "Daichi", "Takuya"]
+FEMALE_NAMES = ["Yui", "Aiko", "Sakura", "Miyu", "Hana", "Emi", "Rina", "Nao", "Akari", "Kaori"]
+
+STATES = ["CORRECT", "IMPROPER", "FAILED"]
+CORRECT, IMPROPER, FAILED = range(3)
+FEEDBACK_POOL = [
+    "Your back is leaning too forward",
+    "Your back is not forward enough",
+    "Your knees are too low, making them closer to your toes",
+    "Your thighs drop too below your knees",
+]
+MAX_REPS = 10
+NO_MISTAKE = -1
+
+
+def _randint(rng, low, high, size, dtype=np.int16):
+    """Inclusive bounds like random.randint."""
+    return rng.integers(low, high + 1, size=size, dtype=dtype)
+
+
+class CaseBatch:
+    """
+    Columnar batch of synthetic cases.
+
+    Every categorical field is a NumPy array of option codes, multi-select fields are a
+    permutation matrix plus a pick count, and repetitions are `(n, MAX_REPS)` matrices of
+    state and mistake codes. Nested case dicts are only built on demand by `case()`.
+    """
+
+    def __init__(self, variant, case_ids, columns):
+        self.variant = variant
+        self.case_ids = case_ids
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.case_ids)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.case(i)
+
+    def __getitem__(self, i):
+        return self.case(i)
+
+    @property
+    def nbytes(self):
+        return self.case_ids.nbytes + sum(column.nbytes for column in self.columns.values())
+
+    def _identification(self, i, case_id):
+        c = self.columns
+        gender = GENDERS[c["gender"][i]]
+        if self.variant == "japanese":
+            names = MALE_NAMES if gender == "Male" else FEMALE_NAMES
+            name = f"{names[c['name'][i]]}_{case_id}"
+        else:
+            name = f"User_{case_id}"
+        return {
+            "Name": name,
+            "Age": int(c["age"][i]),
+            "Gender": gender,
+            "Height": int(c["height"][i]),
+            "Weight": int(c["weight"][i]),
+        }
+
+    def _achievement(self, i):
+        template = ACHIEVEMENTS[self.columns["achievement"][i]]
+        return template.format(**{name: int(self.columns[f"achievement_{name}"][i]) for name in ACHIEVEMENT_PARAMS})
+
+    def _repetitions(self, i):
+        c = self.columns
+        reps = []
+        for r in range(int(c["rep_count"][i])):
+            mistakes = [FEEDBACK_POOL[m] for m in (c["mistake_1"][i, r], c["mistake_2"][i, r]) if m != NO_MISTAKE]
+            reps.append({"repetition": r, "state": STATES[c["state"][i, r]], "feedback": mistakes})
+        return reps
+
+    def case(self, i):
+        """Materialize case `i` in the same nested shape as `generate_case`."""
+        c = self.columns
+        case_id = int(self.case_ids[i])
+        personalization = {"User Identification": self._identification(i, case_id)}
+        for section, field, kind, options, *_ in PERSONALIZATION_FIELDS:
+            if kind == "choice":
+                value = options[c[field][i]]
+            elif kind == "sample":
+                value = [options[p] for p in c[f"{field} order"][i, :c[f"{field} count"][i]]]
+            else:
+                value = self._achievement(i)
+            personalization.setdefault(section, {})[field] = value
+        return {
+            "Case ID": case_id,
+            "User Personalization": personalization,
+            "Squat Performance Analysis": self._repetitions(i),
+        }
+
+
+def generate_batch(num_cases, seed=None, variant="generic", start=1):
+    """
+    Draw `num_cases` cases in one vectorized pass.
+
+    Parameters:
+        num_cases (int): Number of cases.
+        seed (int): Seed for `numpy.random.default_rng`, the same seed gives the same batch.
+        variant (str): "generic" (generate_variety_case.py) or "japanese" (generate_variety_case_1.py).
+        start (int): Case ID of the first case.
+
+    Returns:
+        CaseBatch: The columnar batch.
+    """
+    rng = np.random.default_rng(seed)
+    n = num_cases
+    case_ids = np.arange(start, start + n, dtype=np.int64)
+    japanese = variant == "japanese"
+    columns = {}
+
+    gender = rng.integers(0, 2, size=n, dtype=np.int8)
+    columns["gender"] = gender
+    columns["age"] = _randint(rng, 18, 60, n, np.int8)
+    if japanese:
+        male = gender == 0
+        columns["name"] = rng.integers(0, len(MALE_NAMES), size=n, dtype=np.int8)
+        columns["height"] = np.where(male, _randint(rng, 150, 180, n), _randint(rng, 140, 170, n))
+        columns["weight"] = np.where(male, _randint(rng, 50, 80, n), _randint(rng, 40, 70, n))
+    else:
+        columns["height"] = _randint(rng, 150, 200, n)
+        columns["weight"] = _randint(rng, 50, 120, n)
+
+    for _, field, kind, options, *max_picks in PERSONALIZATION_FIELDS:
+        if kind == "choice":
+            columns[field] = rng.integers(0, len(options), size=n, dtype=np.int8)
+        elif kind == "sample":
+            # a random permutation per row; the first `count` entries are the sampled options
+            order = np.argsort(rng.random((n, len(options)), dtype=np.float32), axis=1)
+            columns[f"{field} order"] = order.astype(np.int8)
+            columns[f"{field} count"] = _randint(rng, 1, max_picks[0][1 if japanese else 0], n, np.int8)
+
+    columns["achievement"] = rng.integers(0, len(ACHIEVEMENTS), size=n, dtype=np.int8)
+    for name, (low, high) in ACHIEVEMENT_PARAMS.items():
+        columns[f"achievement_{name}"] = _randint(rng, low, high, n, np.int16)
+
+    # repetitions: every case gets MAX_REPS slots, rep_count says how many are used
+    columns["rep_count"] = _randint(rng, 5, MAX_REPS, n, np.int8)
+    state = rng.integers(0, 3, size=(n, MAX_REPS), dtype=np.int8)
+    special = np.isin(case_ids % 7, (0, 1))
+    uniform = np.where(rng.random(n) > 0.5, CORRECT, FAILED).astype(np.int8)
+    state[special] = uniform[special, None]
+
+    # one or two distinct mistakes per faulty rep: a random first pick plus a non-zero offset
+    first = rng.integers(0, len(FEEDBACK_POOL), size=(n, MAX_REPS), dtype=np.int8)
+    second = (first + rng.integers(1, len(FEEDBACK_POOL), size=(n, MAX_REPS), dtype=np.int8)) % len(FEEDBACK_POOL)
+    second = np.where(rng.integers(1, 3, size=(n, MAX_REPS)) == 2, second, NO_MISTAKE).astype(np.int8)
+    # "leaning too forward" and "not forward enough" contradict each other, drop the latter
+    contradiction = ((first == 0) & (second == 1)) | ((first == 1) & (second == 0))
+    first = np.where(contradiction, 0, first).astype(np.int8)
+    second = np.where(contradiction, NO_MISTAKE, second).astype(np.int8)
+    no_feedback = (state == CORRECT) | special[:, None]
+    columns["mistake_1"] = np.where(no_feedback, NO_MISTAKE, first).astype(np.int8)
+    columns["mistake_2"] = np.where(no_feedback, NO_MISTAKE, second).astype(np.int8)
+    columns["state"] = state
+
+    return CaseBatch(variant, case_ids, columns)